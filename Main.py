@@ -1,225 +1,14 @@
 # -*- coding: utf-8 -*-
-import gradio as gr
-import requests
-import json
-import re
-import os
-import time
+# The request/test engine lives in engine.py and is re-exported here; gradio is only
+# imported when the UI is built, so scripts and CI can use either module headlessly.
+from engine import *  # noqa: F401,F403
 
+# Queue limits, per event type: single sends stay snappy while load/collection runs
+# share a small pool of their own, so one long run can't take every worker slot.
+SEND_CONCURRENCY = 16
+HEAVY_CONCURRENCY = 2
+QUEUE_MAX_SIZE = 100
 
-def safe_convert(value):
-    if isinstance(value, (bytes, bytearray)):
-        return value.decode('utf-8', errors='replace')
-    return str(value)
-
-
-def process_path_variables(url, params):
-    path_params = {}
-    new_params = []
-    variables = re.findall(r'\{(\w+)\}|:(\w+)', url)
-    variables = [v[0] or v[1] for v in variables]
-    for key, value in params or []:
-        if key and value:
-            key = safe_convert(key).strip()
-            value = safe_convert(value).strip()
-            if key in variables:
-                path_params[key] = value
-            else:
-                new_params.append([key, value])
-    for key, val in path_params.items():
-        url = re.sub(rf'\{{{key}\}}|:{key}', val, url)
-    return url, new_params
-
-
-def prepare_request_args(method, url, params, headers, body_type=None,
-                         json_body=None, form_params=None,
-                         file_key=None, uploaded_file=None):
-    # 1) Path variables and filter params
-    resolved_url, filtered_params = process_path_variables(url, params)
-    params_dict = {k: v for k, v in filtered_params if k and v}
-
-    # 2) Headers
-    headers_dict = {}
-    for active, k, v in headers or []:
-        if active and k and v:
-            headers_dict[k.strip()] = v.strip()
-
-    # 3) Body
-    json_data = None
-    data = None
-    files = None
-    if method.upper() in ["POST", "PUT", "PATCH"]:
-        if body_type == "JSON" and json_body and json_body.strip():
-            json_data = json.loads(json_body)
-            headers_dict.setdefault("Content-Type", "application/json")
-        else:
-            data = {k: v for k, v in form_params or [] if k and v}
-            if uploaded_file and file_key and file_key.strip():
-                fname = os.path.basename(uploaded_file.name)
-                files = {file_key.strip(): (fname, open(uploaded_file.name, 'rb'))}
-            else:
-                headers_dict.setdefault("Content-Type", "application/x-www-form-urlencoded")
-
-    return resolved_url, params_dict, headers_dict, json_data, data, files
-
-# --- Core request sender ---
-def send_request(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file):
-    try:
-        original_url = url
-        resolved_url, filtered = process_path_variables(url, params)
-        params_dict = {k: v for k, v in filtered if k and v}
-        headers_dict = {}
-        for active, k, v in headers or []:
-            if active and k and v:
-                headers_dict[safe_convert(k).strip()] = safe_convert(v).strip()
-
-        # prepare body
-        json_data = None
-        data = None
-        files = None
-        if method.upper() in ["POST", "PUT", "PATCH"]:
-            if body_type == "JSON" and json_body and json_body.strip():
-                json_data = json.loads(json_body)
-                headers_dict.setdefault("Content-Type", "application/json")
-            else:
-                data = {k: v for k, v in form_params or [] if k and v}
-                if uploaded_file and file_key and file_key.strip():
-                    fname = os.path.basename(uploaded_file.name)
-                    files = {file_key.strip(): (fname, open(uploaded_file.name, 'rb'))}
-
-                else:
-                    headers_dict.setdefault("Content-Type", "application/x-www-form-urlencoded")
-
-        resp = requests.request(
-            method=method,
-            url=resolved_url,
-            params=params_dict,
-            headers=headers_dict,
-            json=json_data,
-            data=data,
-            files=files,
-            timeout=15
-        )
-        resp.encoding = 'utf-8'
-        try:
-            body = resp.json()
-        except:
-            body = resp.text
-        return json.dumps({
-            "request": {
-                "method": method,
-                "url": original_url,
-                "resolved_url": resp.url,
-                "query_params": params_dict,
-                "headers": headers_dict,
-                "body_type": body_type,
-                "body": json_data if body_type == "JSON" else {"form_data": data, "files": list(files.keys()) if files else []}
-            },
-            "response": {"status": resp.status_code, "headers": dict(resp.headers), "body": body}
-        }, indent=2, ensure_ascii=False)
-    except Exception as e:
-        return json.dumps({"error": "Request Error", "details": safe_convert(e)}, indent=2)
-
-# --- Test utilities ---
-def validate_status(method, url, params=None, headers=None, expected=200,
-                    body_type=None, json_body=None, form_params=None,
-                    file_key=None, uploaded_file=None):
-    resolved_url, params_dict, headers_dict, json_data, data, files = prepare_request_args(
-        method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file
-    )
-    r = requests.request(method=method, url=resolved_url,
-                         params=params_dict, headers=headers_dict,
-                         json=json_data, data=data, files=files, timeout=15)
-    return (r.status_code == expected, r.status_code)
-
-def test_functional(method, url, params=None, headers=None,
-                    body_type=None, json_body=None, form_params=None,
-                    file_key=None, uploaded_file=None):
-    ok, status = validate_status(method, url, params, headers, 200,
-                                 body_type, json_body, form_params, file_key, uploaded_file)
-    return f"Functional: {method} {url} -> {status} ({'PASS' if ok else 'FAIL'})"
-
-def test_error_handling(method, url, params=None, headers=None,
-                        body_type=None, json_body=None, form_params=None,
-                        file_key=None, uploaded_file=None):
-    resolved_url, params_dict, headers_dict, _, _, _ = prepare_request_args(
-        method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file
-    )
-    bad_url = resolved_url.rstrip('/') + "/nonexistent"
-    r = requests.request(method="GET", url=bad_url,
-                         params=params_dict, headers=headers_dict)
-    return f"Error Handling: GET {bad_url} -> {r.status_code}"
-
-def test_performance(method, url, params=None, headers=None,
-                     body_type=None, json_body=None, form_params=None,
-                     file_key=None, uploaded_file=None, iterations=5):
-    resolved_url, params_dict, headers_dict, json_data, data, files = prepare_request_args(
-        method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file
-    )
-    times = []
-    for _ in range(iterations):
-        s = time.time()
-        requests.request(method=method, url=resolved_url,
-                         params=params_dict, headers=headers_dict,
-                         json=json_data, data=data, files=files)
-        times.append(time.time() - s)
-    return f"Performance: Avg {sum(times)/len(times):.3f}s over {iterations} calls"
-
-def test_security(method, url, params=None, headers=None,
-                  body_type=None, json_body=None, form_params=None,
-                  file_key=None, uploaded_file=None):
-
-    resolved_url, params_dict, headers_dict, json_data, data, files = prepare_request_args(
-        method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file
-    )
-
-    r_with_auth = requests.request(method=method, url=resolved_url,
-                                   params=params_dict, headers=headers_dict,
-                                   json=json_data, data=data, files=files)
-    status_with_auth = r_with_auth.status_code
-
-
-    headers_dict_no_auth = headers_dict.copy()
-    headers_dict_no_auth.pop("Authorization", None)
-
-
-    r_no_auth = requests.request(method=method, url=resolved_url,
-                                 params=params_dict, headers=headers_dict_no_auth,
-                                 json=json_data, data=data, files=files)
-    status_no_auth = r_no_auth.status_code
-
-    if status_with_auth != status_no_auth:
-        return f"Security: Missing auth -> {status_no_auth} (Expected: {status_with_auth}) ✅"
-    else:
-        return f"Security: No auth -> {status_no_auth} ⚠️ Check endpoint access control"
-
-
-# --- Runners ---
-def run_all_tests(method, url, params, headers,
-                  body_type=None, json_body=None, form_params=None,
-                  file_key=None, uploaded_file=None):
-    return "\n".join([
-        test_functional(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file),
-        test_error_handling(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file),
-        test_performance(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file),
-        test_security(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
-    ])
-
-def run_selected_tests(method, url, params, headers, test_type,
-                       body_type=None, json_body=None, form_params=None,
-                       file_key=None, uploaded_file=None):
-    if test_type == "Ручное тестирование":
-        return "Manual testing: use your tool to send requests."
-    if test_type == "Автоматизированное тестирование":
-        return "\n".join([
-            test_functional(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file),
-            test_error_handling(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
-        ])
-    if test_type == "Нагрузочное тестирование":
-        return test_performance(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
-    if test_type == "Тестирование безопасности":
-        return test_security(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
-    return "Unknown test type"
 
 # --- Tools & UI ---
 tools_by_type = {
@@ -230,43 +19,129 @@ tools_by_type = {
 }
 
 def update_tool_options(tt):
+    import gradio as gr
     return gr.update(choices=tools_by_type[tt], value=tools_by_type[tt][0])
 
-with gr.Blocks(title="API Tester with Tests") as app:
-    gr.Markdown("""# 🧪 API Tester + Test Suite""")
-    with gr.Row():
-        test_type = gr.Dropdown(list(tools_by_type.keys()), value="Ручное тестирование", label="Тип тестирования")
-        tool_sel  = gr.Dropdown(tools_by_type["Ручное тестирование"], value=tools_by_type["Ручное тестирование"][0], label="Инструмент")
-        test_type.change(update_tool_options, inputs=test_type, outputs=tool_sel)
-    with gr.Row():
-        method = gr.Dropdown(["GET","POST","PUT","DELETE","PATCH","HEAD","OPTIONS"], value="GET", label="HTTP Method")
-        url    = gr.Textbox(label="URL Endpoint", placeholder="https://api.example.com/{id}", max_lines=1, scale=4)
-    with gr.Tabs():
-        with gr.Tab("Params & Headers"):
-            params  = gr.Dataframe(headers=["Key","Value"], col_count=(2,"fixed"), row_count=(1,"dynamic"), type="array", label="Parameters")
-            headers = gr.Dataframe(headers=["✅","Header","Value"], col_count=(3,"fixed"),row_count=(1,"dynamic"), type="array", label="Headers", datatype=["bool","str","str"])
-        with gr.Tab("Body"):
-            body_type = gr.Radio(["JSON","Form Data"], value="JSON", label="Body Type")
-            with gr.Group() as json_grp:
-                json_body = gr.Code(label="JSON Body", language="json", lines=10)
-            with gr.Group(visible=False) as form_grp:
-                form_params   = gr.Dataframe(headers=["Key","Value"], col_count=(2,"fixed"), row_count=(1,"dynamic"), type="array", label="Form Data")
-                file_key      = gr.Textbox(label="File Key")
-                uploaded_file = gr.File(label="Upload File", file_count="single")
-            body_type.change(lambda t: ([gr.update(visible=True), gr.update(visible=False)] if t=="JSON" else [gr.update(visible=False), gr.update(visible=True)]), inputs=body_type, outputs=[json_grp, form_grp])
-    with gr.Row():
-        clear_btn  = gr.Button("Clear")
-        send_btn   = gr.Button("Send Request", variant="primary")
-        sel_btn    = gr.Button("Run Selected Tests")
-        all_btn    = gr.Button("Run All Tests")
-    with gr.Accordion("Response", open=True):
-        output = gr.Code(label="Result", language="json", lines=15)
-    with gr.Accordion("Test Results", open=False):
-        test_out = gr.Textbox(label="Tests", lines=10)
-    clear_btn.click(lambda: ("GET","",[["",""]],[[False,"",""]],"JSON","",[["",""]],"",None), outputs=[method,url,params,headers,body_type,json_body,form_params,file_key,uploaded_file])
-    send_btn.click(send_request, inputs=[method,url,params,headers,body_type,json_body,form_params,file_key,uploaded_file], outputs=output)
-    sel_btn.click(run_selected_tests, inputs=[method,url,params,headers,test_type,body_type,json_body,form_params,file_key,uploaded_file], outputs=test_out)
-    all_btn.click(run_all_tests, inputs=[method,url,params,headers,body_type,json_body,form_params,file_key,uploaded_file], outputs=test_out)
+
+def stop_runs(token):
+    # stops every run this session started; the next run gets a fresh token
+    if token is not None:
+        token.cancel()
+    return CancelToken()
+
+
+def build_app(send_concurrency=SEND_CONCURRENCY, heavy_concurrency=HEAVY_CONCURRENCY, max_queue=QUEUE_MAX_SIZE):
+    import gradio as gr
+    configure_history(override=False)
+    with gr.Blocks(title="API Tester with Tests") as app:
+        gr.Markdown("""# 🧪 API Tester + Test Suite""")
+        with gr.Row():
+            test_type = gr.Dropdown(list(tools_by_type.keys()), value="Ручное тестирование", label="Тип тестирования")
+            tool_sel  = gr.Dropdown(tools_by_type["Ручное тестирование"], value=tools_by_type["Ручное тестирование"][0], label="Инструмент")
+            test_type.change(update_tool_options, inputs=test_type, outputs=tool_sel, queue=False)
+        with gr.Row():
+            method = gr.Dropdown(["GET","POST","PUT","DELETE","PATCH","HEAD","OPTIONS"], value="GET", label="HTTP Method")
+            url    = gr.Textbox(label="URL Endpoint", placeholder="https://api.example.com/{id}", max_lines=1, scale=4)
+        with gr.Tabs():
+            with gr.Tab("Params & Headers"):
+                params  = gr.Dataframe(headers=["Key","Value"], col_count=(2,"fixed"), row_count=(1,"dynamic"), type="array", label="Parameters")
+                headers = gr.Dataframe(headers=["✅","Header","Value"], col_count=(3,"fixed"),row_count=(1,"dynamic"), type="array", label="Headers", datatype=["bool","str","str"])
+            with gr.Tab("Body"):
+                body_type = gr.Radio(["JSON","Form Data"], value="JSON", label="Body Type")
+                with gr.Group() as json_grp:
+                    json_body = gr.Code(label="JSON Body", language="json", lines=10)
+                with gr.Group(visible=False) as form_grp:
+                    form_params   = gr.Dataframe(headers=["Key","Value"], col_count=(2,"fixed"), row_count=(1,"dynamic"), type="array", label="Form Data")
+                    file_key      = gr.Textbox(label="File Key")
+                    uploaded_file = gr.File(label="Upload File", file_count="single")
+                body_type.change(lambda t: ([gr.update(visible=True), gr.update(visible=False)] if t=="JSON" else [gr.update(visible=False), gr.update(visible=True)]), inputs=body_type, outputs=[json_grp, form_grp], queue=False)
+            with gr.Tab("Load"):
+                with gr.Row():
+                    iterations  = gr.Number(value=5, precision=0, label="Requests (0 = until duration)")
+                    concurrency = gr.Number(value=1, precision=0, label="Concurrency")
+                    target_rps  = gr.Number(value=0, label="Target RPS (0 = unlimited)")
+                    ramp_up     = gr.Number(value=0, label="Ramp-up, s")
+                    duration    = gr.Number(value=0, label="Duration, s (0 = by request count)")
+                    processes   = gr.Number(value=1, precision=0, label="Processes (splits concurrency and RPS)")
+                load_mode = gr.Radio([("Closed loop", "closed"), ("Open loop (fixed arrival rate, needs target RPS)", "open")],
+                                     value="closed", label="Load model")
+                with gr.Row():
+                    host_limits = gr.Textbox(label="Host limits, one 'HOST RPS [MAX_IN_FLIGHT]' per line ('*' = any other host; applies to everyone using this instance)",
+                                             placeholder="api.partner.com 50 10", lines=3, scale=3)
+                    limits_out  = gr.Textbox(label="Active limits", value=describe_host_limits, lines=3, interactive=False)
+                limits_btn = gr.Button("Apply limits")
+                remote_workers = gr.Textbox(label="Remote workers (host:port, comma-separated; start them with `python cli.py worker`)", max_lines=1)
+                worker_token = gr.Textbox(label="Worker token (the workers' --token; empty = $FAPI_WORKER_TOKEN)", type="password", max_lines=1)
+                calibrate = gr.Checkbox(value=False, label="Calibrate first: measure this client's own overhead and max RPS (~1 s) and report latency net of it")
+                with gr.Accordion("Capacity search: step the offered RPS up until the SLO breaks (uses the processes and remote workers above)", open=False):
+                    with gr.Row():
+                        cap_start  = gr.Number(value=10, label="Start RPS")
+                        cap_step   = gr.Number(value=10, label="Step, RPS")
+                        cap_max    = gr.Number(value=0, label="Max RPS (0 = until breach)")
+                        cap_hold   = gr.Number(value=CAPACITY_HOLD, label="Hold per step, s")
+                    with gr.Row():
+                        cap_p99    = gr.Number(value=500, label="SLO: p99, ms")
+                        cap_errors = gr.Number(value=1, label="SLO: max errors, %")
+                        cap_flight = gr.Number(value=CAPACITY_IN_FLIGHT, precision=0, label="Max in flight")
+                    cap_btn = gr.Button("Find Capacity")
+            with gr.Tab("Collection"):
+                with gr.Row():
+                    collection_file    = gr.File(label="Collection (JSON list or Postman v2.1)", file_count="single", file_types=[".json"])
+                    collection_workers = gr.Number(value=COLLECTION_WORKERS, precision=0, label="Parallel requests")
+                coll_btn = gr.Button("Run Collection")
+                coll_out = gr.Textbox(label="Collection Results", lines=10)
+            with gr.Tab("History"):
+                with gr.Row():
+                    hist_endpoint = gr.Textbox(label="Endpoint (prefix, as entered; empty = all)", max_lines=1, scale=3)
+                    hist_method   = gr.Dropdown(["", "GET","POST","PUT","DELETE","PATCH","HEAD","OPTIONS"], value="", label="Method")
+                    hist_status   = gr.Number(value=0, precision=0, label="Status (0 = any)")
+                    hist_days     = gr.Number(value=7, label="Last N days (0 = all)")
+                hist_btn   = gr.Button("Search History")
+                hist_daily = gr.Dataframe(headers=list(HISTORY_DAILY_COLUMNS), type="array", label="Daily latency", interactive=False)
+                hist_runs  = gr.Dataframe(headers=list(HISTORY_COLUMNS), type="array", label="Latest runs", interactive=False)
+        with gr.Row():
+            clear_btn  = gr.Button("Clear")
+            send_btn   = gr.Button("Send Request", variant="primary")
+            sel_btn    = gr.Button("Run Selected Tests")
+            all_btn    = gr.Button("Run All Tests")
+            stop_btn   = gr.Button("Stop", variant="stop")
+        run_token = gr.State(CancelToken)
+        with gr.Accordion("Response", open=True):
+            max_body = gr.Number(value=MAX_BODY_BYTES // (1024 * 1024), label="Max body in memory, MB (larger responses are saved to a temp file)")
+            compact = gr.Checkbox(value=False, label=f"Compact output (always on for bodies over {COMPACT_OUTPUT_BYTES // (1024 * 1024)} MB)")
+            output = gr.Code(label="Result", language="json", lines=15)
+        with gr.Accordion("Test Results", open=False):
+            test_out = gr.Textbox(label="Tests", lines=10)
+        clear_btn.click(lambda: ("GET","",[["",""]],[[False,"",""]],"JSON","",[["",""]],"",None), outputs=[method,url,params,headers,body_type,json_body,form_params,file_key,uploaded_file], queue=False)
+        send_btn.click(send_request_async, inputs=[method,url,params,headers,body_type,json_body,form_params,file_key,uploaded_file,max_body,compact], outputs=output,
+                       concurrency_limit=send_concurrency, concurrency_id="send")
+        load_inputs = [iterations,concurrency,target_rps,ramp_up,duration,load_mode,processes,remote_workers,calibrate,worker_token]
+        # test runs and collections share one "heavy" limit across every user of the instance
+        sel_btn.click(run_selected_tests_async, inputs=[method,url,params,headers,test_type,body_type,json_body,form_params,file_key,uploaded_file]+load_inputs+[run_token], outputs=test_out,
+                      concurrency_limit=heavy_concurrency, concurrency_id="heavy")
+        all_btn.click(run_all_tests_async, inputs=[method,url,params,headers,body_type,json_body,form_params,file_key,uploaded_file]+load_inputs+[run_token], outputs=test_out,
+                      concurrency_limit=heavy_concurrency, concurrency_id="heavy")
+        cap_btn.click(run_capacity_search, inputs=[method,url,params,headers,body_type,json_body,form_params,file_key,uploaded_file,
+                                                   cap_start,cap_step,cap_max,cap_hold,cap_p99,cap_errors,cap_flight,
+                                                   processes,remote_workers,worker_token,run_token], outputs=test_out,
+                      concurrency_limit=heavy_concurrency, concurrency_id="heavy")
+        coll_btn.click(run_collection, inputs=[collection_file,collection_workers,run_token], outputs=coll_out,
+                       concurrency_limit=heavy_concurrency, concurrency_id="heavy")
+        hist_btn.click(lambda e, m, s, d: search_history(e, m, d, s), inputs=[hist_endpoint,hist_method,hist_status,hist_days],
+                       outputs=[hist_daily,hist_runs], concurrency_limit=send_concurrency, concurrency_id="send")
+        limits_btn.click(configure_host_limits, inputs=host_limits, outputs=limits_out, queue=False)
+        # runs wind down on their own and show what they measured so far
+        stop_btn.click(stop_runs, inputs=run_token, outputs=run_token, queue=False)
+    app.queue(default_concurrency_limit=send_concurrency, max_size=max_queue)
+    return app
+
+
+def __getattr__(name):
+    # `Main.app` keeps working for tooling that expects a module-level Blocks object
+    if name == "app":
+        return build_app()
+    raise AttributeError(name)
+
 
 if __name__ == "__main__":
-    app.launch(server_port=7860, share=True)
+    build_app().launch(server_port=7860, share=True)
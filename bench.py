@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# Benchmarks for the engine's own hot paths, run against a local stand-in server so the
+# numbers are the tester's cost, not a backend's:
+#   python bench.py                                   (0 ms server, 1 KB responses)
+#   python bench.py --latency-ms 20 --payload-kb 256 --only send test_
+#   python bench.py --save before.json   ...change the engine...   python bench.py --compare before.json
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import engine
+
+JSON_BODY = json.dumps({"name": "widget", "tags": ["a", "b", "c"], "price": 9.99,
+                        "attributes": {str(i): "v" * 16 for i in range(32)}})
+
+
+def measure(call, seconds):
+    # calls back to back until the time is up; returns per-call latencies and wall time
+    hist = engine.LatencyHistogram()
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter_ns()
+    while time.perf_counter() < deadline:
+        s = time.perf_counter_ns()
+        call()
+        hist.record(time.perf_counter_ns() - s)
+    return hist, (time.perf_counter_ns() - started) / 1e9
+
+
+async def measure_async(call, seconds):
+    hist = engine.LatencyHistogram()
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter_ns()
+    while time.perf_counter() < deadline:
+        s = time.perf_counter_ns()
+        await call()
+        hist.record(time.perf_counter_ns() - s)
+    return hist, (time.perf_counter_ns() - started) / 1e9
+
+
+def cases(base, concurrency):
+    # (name, over the network?, runner returning (histogram, elapsed)); runners get the duration
+    url = base + "/items/{id}/{sub}"
+    params = [["id", "42"], ["sub", "details"], ["q", "1"], ["page", "2"]]
+    headers = [[True, "Authorization", "Bearer token"], [True, "Accept", "application/json"]]
+    form = [["k%d" % i, "v%d" % i] for i in range(8)]
+    get_args = ("GET", url, params, headers, "JSON", "", [], "", None)
+    post_args = ("POST", url, params, headers, "JSON", JSON_BODY, [], "", None)
+
+    resp = engine.pooled_request("GET", base + "/items", stream=True)
+    body = engine.read_body(resp)
+    raw = engine.get_session(base).get(base + "/items").content
+
+    def ctx():
+        return engine.RunContext(*get_args)
+
+    def checks():
+        shared = ctx()
+        return engine.run_checks([(name, lambda f=f: f(*get_args, ctx=shared)) for name, f in (
+            ("Functional", engine.test_functional), ("Error Handling", engine.test_error_handling),
+            ("Security", engine.test_security))])
+
+    def load(seconds):
+        result = engine.run_load(ctx().send, concurrency=concurrency, duration=seconds)
+        return result["histogram"], result["elapsed"]
+
+    def load_async(seconds):
+        async def go():
+            result = await engine.run_load_async(ctx().send_async, concurrency=concurrency, duration=seconds)
+            await engine.close_async_clients()
+            return result
+        result = asyncio.run(go())
+        return result["histogram"], result["elapsed"]
+
+    def sync(call):
+        return lambda seconds: measure(call, seconds)
+
+    def async_(call):
+        async def go(seconds):
+            try:
+                return await measure_async(call, seconds)
+            finally:
+                await engine.close_async_clients()
+        return lambda seconds: asyncio.run(go(seconds))
+
+    return [
+        ("path_variables", False, sync(lambda: engine.process_path_variables(url, params))),
+        ("prepare_get", False, sync(lambda: engine.prepare_request_args(*get_args))),
+        ("prepare_json", False, sync(lambda: engine.prepare_request_args(*post_args))),
+        ("prepare_form", False, sync(lambda: engine.prepare_request_args("POST", url, params, headers, "Form Data",
+                                                                         "", form, "", None))),
+        ("parse_body", False, sync(lambda: engine.json_loads(raw))),
+        ("format_exchange", False, sync(lambda: engine.format_exchange("GET", url, resp, body, {}, {}, "JSON",
+                                                                       None, None, None))),
+        ("pooled_request", True, sync(lambda: engine.pooled_request("GET", base + "/items"))),
+        ("send_request", True, sync(lambda: engine.send_request(*get_args))),
+        ("send_request_json", True, sync(lambda: engine.send_request(*post_args))),
+        ("send_request_async", True, async_(lambda: engine.send_request_async(*get_args))),
+        ("test_functional", True, sync(lambda: engine.test_functional(*get_args))),
+        ("test_error_handling", True, sync(lambda: engine.test_error_handling(*get_args, ctx=ctx()))),
+        ("test_security", True, sync(lambda: engine.test_security(*get_args, ctx=ctx()))),
+        ("run_checks", True, sync(checks)),
+        (f"load_x{concurrency}", True, load),
+        (f"load_async_x{concurrency}", True, load_async),
+    ]
+
+
+def run(latency_ms=0.0, payload_kb=1.0, seconds=1.0, concurrency=8, only=None):
+    rows = []
+    # recording stays on (it is part of every send) but goes to a scratch file
+    scratch = tempfile.mkdtemp(prefix="fapi-bench-")
+    engine.configure_history(os.path.join(scratch, "history.db"))
+    engine.clear_host_limits()
+    if concurrency > engine.POOL_SIZE:
+        engine.configure_pool(pool_size=concurrency)
+    try:
+        with engine.StandInServer(latency_ms / 1000.0, int(payload_kb * 1024)) as server:
+            for name, network, runner in cases(server.url, concurrency):
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                runner(min(0.2, seconds))  # warm-up: connections, caches, imports
+                hist, elapsed = runner(seconds)
+                mean = hist.mean() / 1000
+                rows.append({
+                    "name": name, "calls": hist.count,
+                    "mean_us": round(mean, 1),
+                    "p50_us": round(hist.percentile(50) / 1000, 1),
+                    "p99_us": round(hist.percentile(99) / 1000, 1),
+                    "ops_s": round(hist.count / elapsed, 1) if elapsed else 0,
+                    # what the tester adds on top of the server's own delay
+                    "overhead_us": round(mean - latency_ms * 1000 if network else mean, 1),
+                })
+    finally:
+        engine.configure_history("")
+        shutil.rmtree(scratch, ignore_errors=True)
+    return rows
+
+
+def format_rows(rows, baseline=None):
+    columns = ["name", "calls", "mean_us", "p50_us", "p99_us", "ops_s", "overhead_us"]
+    before = {row["name"]: row for row in baseline or []}
+    lines = []
+    for row in rows:
+        cells = [str(row[c]) for c in columns]
+        if row["name"] in before and before[row["name"]]["overhead_us"]:
+            change = row["overhead_us"] / before[row["name"]]["overhead_us"] - 1
+            cells.append(f"{change:+.1%}")
+        lines.append(cells)
+    header = columns + (["vs baseline"] if baseline else [])
+    widths = [max([len(h)] + [len(r[i]) for r in lines if i < len(r)]) for i, h in enumerate(header)]
+    return "\n".join("  ".join(v.ljust(w) for v, w in zip(r, widths)).rstrip() for r in [header] + lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the tester's own per-call overhead and throughput")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay the stand-in server adds per request")
+    parser.add_argument("--payload-kb", type=float, default=1.0, help="response body size")
+    parser.add_argument("--seconds", type=float, default=1.0, help="time spent on each benchmark")
+    parser.add_argument("--concurrency", type=int, default=8, help="workers for the load benchmarks")
+    parser.add_argument("--only", nargs="+", metavar="PREFIX", help="run only benchmarks whose name starts with these")
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="show overhead change against results saved earlier")
+    parser.add_argument("--max-regression", type=float, default=None, metavar="PCT",
+                        help="with --compare, exit 1 if any overhead grew by more than this many percent")
+    args = parser.parse_args(argv)
+
+    rows = run(args.latency_ms, args.payload_kb, args.seconds, args.concurrency, args.only)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print(f"stand-in server: {args.latency_ms:g} ms latency, {args.payload_kb:g} KB responses, "
+          f"json backend {engine.json_backend}")
+    print(format_rows(rows, baseline))
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": rows}, f, indent=2)
+    if baseline and args.max_regression is not None:
+        before = {row["name"]: row["overhead_us"] for row in baseline}
+        worse = [row["name"] for row in rows
+                 if before.get(row["name"]) and row["overhead_us"] > before[row["name"]] * (1 + args.max_regression / 100)]
+        if worse:
+            print(f"regressed by more than {args.max_regression:g}%: {', '.join(worse)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# Headless entry point: runs the engine's checks without importing gradio.
+#   python cli.py test --url https://api.example.com/items/{id} -p id=5 -H "Authorization: Bearer x"
+#   python cli.py send --method POST --url ... --json '{"a": 1}'
+#   python cli.py collection regression.json --workers 16
+#   python cli.py --host-limit "api.partner.com 50 10" test --url ... --iterations 1000 --concurrency 32
+#   FAPI_WORKER_TOKEN=s3cret python cli.py worker --host 0.0.0.0
+#     (then, with the same FAPI_WORKER_TOKEN: python cli.py test ... --remote node1:7861 node2:7861)
+#   python cli.py capacity --url ... --start 50 --step 50 --p99-ms 300 --max-errors 1
+#   python cli.py history --endpoint https://api.example.com/items --days 30
+import argparse
+import signal
+import sys
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import engine
+
+TEST_TYPES = {
+    "all": None,
+    "functional": "Functional",
+    "error": "Error Handling",
+    "performance": "Performance",
+    "security": "Security",
+}
+
+
+def _pair(text, sep="="):
+    key, _, value = text.partition(sep)
+    return [key.strip(), value.strip()]
+
+
+def add_request_args(parser):
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--url", required=True)
+    parser.add_argument("-p", "--param", action="append", default=[], metavar="KEY=VALUE",
+                        help="query or path parameter, repeatable")
+    parser.add_argument("-H", "--header", action="append", default=[], metavar="'NAME: VALUE'")
+    parser.add_argument("--json", dest="json_body", help="JSON request body")
+    parser.add_argument("-f", "--form", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--file", metavar="KEY=PATH", help="multipart file upload")
+
+
+def request_args(args):
+    file_key, uploaded_file = None, None
+    if args.file:
+        file_key, path = _pair(args.file)
+        uploaded_file = SimpleNamespace(name=path)
+    return (args.method.upper(), args.url,
+            [_pair(p) for p in args.param],
+            [[True, *_pair(h, ":")] for h in args.header],
+            "JSON" if args.json_body else "Form Data",
+            args.json_body,
+            [_pair(f) for f in args.form],
+            file_key, uploaded_file)
+
+
+@contextmanager
+def stop_on_interrupt():
+    # the first Ctrl+C stops the run and keeps its partial results; a second one aborts as usual
+    cancel = engine.CancelToken()
+
+    def handler(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        print("stopping... (Ctrl+C again to abort)", file=sys.stderr)
+        cancel.cancel()
+
+    previous = signal.signal(signal.SIGINT, handler)
+    try:
+        yield cancel
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
+def cmd_send(args):
+    print(engine.send_request(*request_args(args), max_body_mb=args.max_body_mb, compact=args.compact))
+    return 0
+
+
+def cmd_test(args):
+    req = request_args(args)
+    load = engine.load_options(args.iterations, args.concurrency, args.rps, args.ramp_up, args.duration,
+                               "open" if args.open_loop else "closed", args.processes, args.remote,
+                               args.calibrate, args.worker_token)
+    with stop_on_interrupt() as cancel:
+        ctx = engine.RunContext(*req, cancel=cancel)
+        checks = {
+            "Functional": lambda: engine.test_functional(*req, ctx=ctx),
+            "Error Handling": lambda: engine.test_error_handling(*req, ctx=ctx),
+            "Performance": lambda: engine.test_performance(*req, **load, ctx=ctx),
+            "Security": lambda: engine.test_security(*req, ctx=ctx),
+        }
+        selected = [TEST_TYPES[t] for t in args.tests] if "all" not in args.tests else list(checks)
+        lines = engine.run_checks([(name, checks[name]) for name in selected])
+    print("\n".join(lines))
+    if cancel.is_set():
+        return 130
+    return 1 if any("(FAIL)" in line or ": Error " in line for line in lines) else 0
+
+
+def cmd_collection(args):
+    report = ""
+    with stop_on_interrupt() as cancel:
+        for report in engine.run_collection(args.path, args.workers, cancel):
+            pass
+    print(report)
+    if cancel.is_set():
+        return 130
+    summary = report.rsplit("\n", 2)[-2] if "\n" in report else report
+    return 0 if " 0 failed, 0 errors" in summary else 1
+
+
+def cmd_worker(args):
+    token = engine.resolve_worker_token(args.token)
+    if not token and not engine.is_loopback(args.host):
+        print(f"refusing to serve on {args.host} without a token: pass --token or set "
+              f"{engine.WORKER_TOKEN_ENV}", file=sys.stderr)
+        return 2
+    print(f"load worker listening on {args.host}:{args.port}" + (" (token required)" if token else ""),
+          file=sys.stderr)
+    try:
+        engine.serve_worker(args.host, args.port, token)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_capacity(args):
+    report = ""
+    with stop_on_interrupt() as cancel:
+        for report in engine.run_capacity_search(*request_args(args), args.start, args.step, args.max, args.hold,
+                                                 args.p99_ms, args.max_errors, args.max_in_flight, args.processes,
+                                                 args.remote, args.worker_token, cancel):
+            print(report.rsplit("\n", 1)[-1], file=sys.stderr)
+    print(report)
+    if cancel.is_set():
+        return 130
+    return 0 if report.rsplit("\n", 1)[-1].startswith("Capacity: ~") else 1
+
+
+def _table(columns, rows):
+    cells = [[("" if v is None else str(v)) for v in row] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    return "\n".join("  ".join(v.ljust(w) for v, w in zip(row, widths)).rstrip()
+                     for row in [list(columns)] + cells)
+
+
+def cmd_history(args):
+    daily, runs = engine.search_history(args.endpoint, args.method, args.days, args.status, args.kind, args.limit)
+    print(_table(engine.HISTORY_DAILY_COLUMNS, daily))
+    print()
+    print(_table(engine.HISTORY_COLUMNS, runs))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless API tester")
+    parser.add_argument("--host-limit", action="append", default=[], metavar='"HOST RPS [MAX_IN_FLIGHT]"',
+                        help="cap request rate and requests in flight for a host ('*' = any host); repeatable")
+    parser.add_argument("--history", default=engine.HISTORY_DB, metavar="PATH",
+                        help="SQLite file that records every run ('' = don't record)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    send = sub.add_parser("send", help="send one request and print the exchange as JSON")
+    add_request_args(send)
+    send.add_argument("--max-body-mb", type=float, default=None)
+    send.add_argument("--compact", action="store_true", help="print the exchange without indentation")
+    send.set_defaults(func=cmd_send)
+
+    test = sub.add_parser("test", help="run the test suite against one request")
+    add_request_args(test)
+    test.add_argument("--tests", nargs="+", choices=list(TEST_TYPES), default=["all"])
+    test.add_argument("--iterations", type=int, default=5)
+    test.add_argument("--concurrency", type=int, default=1)
+    test.add_argument("--rps", type=float, default=None, help="target requests per second")
+    test.add_argument("--ramp-up", type=float, default=0, help="seconds until all workers are running")
+    test.add_argument("--duration", type=float, default=None, help="run for a fixed time instead of --iterations")
+    test.add_argument("--open-loop", action="store_true",
+                      help="send on a fixed schedule at --rps and measure latency from the intended start")
+    test.add_argument("--processes", type=int, default=1, help="spread the load over this many worker processes")
+    test.add_argument("--remote", nargs="+", metavar="HOST:PORT",
+                      help="split the load across workers started with `cli.py worker`")
+    test.add_argument("--worker-token", default=None,
+                      help=f"shared secret of the --remote workers (default: ${engine.WORKER_TOKEN_ENV})")
+    test.add_argument("--calibrate", action="store_true",
+                      help="measure the client's own overhead and ceiling first and report latency net of it")
+    test.set_defaults(func=cmd_test)
+
+    coll = sub.add_parser("collection", help="run a saved collection of requests")
+    coll.add_argument("path")
+    coll.add_argument("--workers", type=int, default=engine.COLLECTION_WORKERS)
+    coll.set_defaults(func=cmd_collection)
+
+    worker = sub.add_parser("worker", help="serve load runs for a remote controller")
+    worker.add_argument("--host", default="127.0.0.1")
+    worker.add_argument("--port", type=int, default=engine.WORKER_PORT)
+    worker.add_argument("--token", default=None,
+                        help=f"shared secret controllers must send (default: ${engine.WORKER_TOKEN_ENV}); "
+                             "required unless bound to loopback")
+    worker.set_defaults(func=cmd_worker)
+
+    cap = sub.add_parser("capacity", help="raise the request rate step by step until the SLO breaks")
+    add_request_args(cap)
+    cap.add_argument("--start", type=float, default=10, help="first offered rate, req/s")
+    cap.add_argument("--step", type=float, default=None, help="rate added per step (default: the start rate)")
+    cap.add_argument("--max", type=float, default=None, help="highest rate to try")
+    cap.add_argument("--hold", type=float, default=engine.CAPACITY_HOLD, help="seconds each step runs")
+    cap.add_argument("--p99-ms", type=float, default=500, help="SLO: highest acceptable p99")
+    cap.add_argument("--max-errors", type=float, default=1.0, help="SLO: highest acceptable error rate, percent")
+    cap.add_argument("--max-in-flight", type=int, default=engine.CAPACITY_IN_FLIGHT)
+    cap.add_argument("--processes", type=int, default=1, help="spread each step over this many worker processes")
+    cap.add_argument("--remote", nargs="+", metavar="HOST:PORT",
+                     help="split each step across workers started with `cli.py worker`")
+    cap.add_argument("--worker-token", default=None,
+                     help=f"shared secret of the --remote workers (default: ${engine.WORKER_TOKEN_ENV})")
+    cap.set_defaults(func=cmd_capacity)
+
+    hist = sub.add_parser("history", help="show recorded runs and daily latency trends")
+    hist.add_argument("--endpoint", help="URL (or URL prefix) as it was entered")
+    hist.add_argument("--method")
+    hist.add_argument("--status", type=int)
+    hist.add_argument("--kind", choices=["send", "functional", "error_handling", "performance", "security", "collection",
+                                         "capacity"])
+    hist.add_argument("--days", type=float, default=7, help="how far back to look (0 = everything)")
+    hist.add_argument("--limit", type=int, default=50, help="latest runs to list")
+    hist.set_defaults(func=cmd_history)
+
+    args = parser.parse_args(argv)
+    if args.host_limit:
+        engine.configure_host_limits("\n".join(args.host_limit))
+    engine.configure_history(args.history)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3006 @@
+# -*- coding: utf-8 -*-
+import requests
+import json
+import hmac
+import ipaddress
+import re
+import os
+import time
+import tempfile
+import math
+import asyncio
+import atexit
+import threading
+import weakref
+import queue
+import shutil
+import mimetypes
+import multiprocessing
+import socket
+import socketserver
+import sqlite3
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import closing, contextmanager
+from functools import lru_cache, partial
+from types import SimpleNamespace
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+REQUEST_TIMEOUT = 15
+POOL_SIZE = 20
+MAX_RETRIES = 2
+MAX_PARALLEL_CHECKS = 4
+COLLECTION_WORKERS = 8
+MAX_BODY_BYTES = 10 * 1024 * 1024
+PREVIEW_BYTES = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+WORKER_PORT = 7861
+# shared secret between a controller and its remote workers, unless given explicitly
+WORKER_TOKEN_ENV = "FAPI_WORKER_TOKEN"
+PROGRESS_INTERVAL = 1.0
+
+
+def safe_convert(value):
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+# --- JSON backend ---
+JSON_BACKENDS = ("orjson", "ujson", "json")
+COMPACT_OUTPUT_BYTES = 1024 * 1024
+json_backend = None
+json_loads = None
+json_dumps = None
+# 20+ digits in a row may be an integer past 64 bits, which the fast backends turn into a
+# float or refuse; those documents go through the stdlib, which keeps them exact
+LONG_NUMBER = re.compile(rb'\d{20}')
+
+
+def stdlib_dumps(obj, pretty=True):
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=safe_convert)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=safe_convert)
+
+
+def exact_loads(fast_loads):
+    def loads(data):
+        raw = data.encode('utf-8') if isinstance(data, str) else data
+        if LONG_NUMBER.search(raw):
+            return json.loads(raw)
+        return fast_loads(data)
+    return loads
+
+
+def exact_dumps(fast_dumps):
+    def dumps(obj, pretty=True):
+        try:
+            return fast_dumps(obj, pretty)
+        except (TypeError, OverflowError):
+            return stdlib_dumps(obj, pretty)
+    return dumps
+
+
+def use_json_backend(name=None):
+    # picks the fastest installed backend, or the named one; the stdlib is always there
+    global json_backend, json_loads, json_dumps
+    for candidate in (name,) if name else JSON_BACKENDS:
+        try:
+            if candidate == "orjson":
+                import orjson
+                loads = exact_loads(orjson.loads)
+                def fast_dumps(obj, pretty, _dumps=orjson.dumps, _indent=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS):
+                    return _dumps(obj, default=safe_convert, option=_indent if pretty else orjson.OPT_NON_STR_KEYS).decode('utf-8')
+                dumps = exact_dumps(fast_dumps)
+            elif candidate == "ujson":
+                import ujson
+                # ujson takes str or bytes, not bytearray/memoryview
+                loads = exact_loads(lambda data, _loads=ujson.loads: _loads(
+                    bytes(data) if isinstance(data, (bytearray, memoryview)) else data))
+                dumps = exact_dumps(lambda obj, pretty, _dumps=ujson.dumps: _dumps(
+                    obj, indent=2 if pretty else 0, ensure_ascii=False, default=safe_convert))
+            elif candidate == "json":
+                loads = json.loads
+                dumps = stdlib_dumps
+            else:
+                raise ValueError(f"unknown JSON backend {candidate!r}")
+        except ImportError:
+            if name:
+                raise
+            continue
+        json_backend, json_loads, json_dumps = candidate, loads, dumps
+        return candidate
+
+
+use_json_backend()
+
+
+# --- Request bodies ---
+class FileSource:
+    # a file upload described by path; every send opens its own handle
+    def __init__(self, path, filename=None, content_type=None):
+        self.path = path
+        self.filename = filename or os.path.basename(path)
+        self.content_type = content_type or mimetypes.guess_type(self.filename)[0] or "application/octet-stream"
+
+    def size(self):
+        return os.path.getsize(self.path)
+
+    def open(self):
+        return open(self.path, 'rb')
+
+
+class MultipartStream:
+    # multipart/form-data encoder that reads files in CHUNK_SIZE pieces instead of buffering
+    # the whole body; the length is known up front so requests sends Content-Length
+    def __init__(self, fields, files):
+        self.boundary = uuid.uuid4().hex
+        quote = lambda v: safe_convert(v).replace('"', '%22')
+        self.parts = []
+        for name, value in (fields or {}).items():
+            self.parts.append(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{quote(name)}"\r\n\r\n'.encode()
+                              + safe_convert(value).encode('utf-8') + b"\r\n")
+        for name, source in files.items():
+            self.parts.append(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{quote(name)}"; '
+                              f'filename="{quote(source.filename)}"\r\nContent-Type: {source.content_type}\r\n\r\n'.encode())
+            self.parts.append(source)
+            self.parts.append(b"\r\n")
+        self.parts.append(f"--{self.boundary}--\r\n".encode())
+        self.length = sum(len(p) if isinstance(p, bytes) else p.size() for p in self.parts)
+        self._index = 0
+        self._handle = None
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        size = CHUNK_SIZE if size is None or size < 0 else size
+        while self._index < len(self.parts):
+            part = self.parts[self._index]
+            if isinstance(part, bytes):
+                self._index += 1
+                if part:
+                    return part
+                continue
+            if self._handle is None:
+                self._handle = part.open()
+            chunk = self._handle.read(size)
+            if chunk:
+                return chunk
+            self._handle.close()
+            self._handle = None
+            self._index += 1
+        return b""
+
+    def __iter__(self):
+        chunk = self.read(CHUNK_SIZE)
+        while chunk:
+            yield chunk
+            chunk = self.read(CHUNK_SIZE)
+
+    async def aiter(self):
+        for chunk in self:
+            yield chunk
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+def streamed_body(headers, data, files):
+    # swaps FileSource uploads for a fresh MultipartStream; returns (headers, data, files, stream)
+    if not files or not any(isinstance(f, FileSource) for f in files.values()):
+        return headers, data, files, None
+    stream = MultipartStream(data, files)
+    headers = {k: v for k, v in (headers or {}).items() if k.lower() not in ("content-type", "content-length")}
+    headers.update({"Content-Type": stream.content_type, "Content-Length": str(len(stream))})
+    return headers, stream, None, stream
+
+
+# --- Cancellation ---
+class Cancelled(Exception):
+    pass
+
+
+class CancelToken(threading.Event):
+    # cooperative stop flag for one run; pacing sleeps wait on it, so cancel() wakes them at once
+    def __init__(self):
+        super().__init__()
+        self._callbacks = {}
+        self._callbacks_lock = threading.Lock()
+
+    def cancel(self):
+        with self._callbacks_lock:
+            self.set()
+            callbacks, self._callbacks = list(self._callbacks.values()), {}
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback):
+        # runs callback on cancel (now, if already cancelled); returns a function that unregisters it
+        with self._callbacks_lock:
+            if not self.is_set():
+                key = object()
+                self._callbacks[key] = callback
+                return partial(self._callbacks.pop, key, None)
+        callback()
+        return lambda: None
+
+    def check(self):
+        if self.is_set():
+            raise Cancelled("run stopped")
+
+    def __deepcopy__(self, memo):
+        # Gradio deep-copies State defaults per session; each session gets its own live token
+        return CancelToken()
+
+
+def _abort_connection(conn):
+    # shutdown() wakes a thread blocked in recv on this socket; close() alone may not
+    sock = getattr(conn, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+# --- Request timing ---
+# phases are recorded in nanoseconds; dns/connect/tls are 0 when a kept-alive connection is reused
+TIMING_PHASES = ("dns", "connect", "tls", "ttfb", "transfer")
+_trace = threading.local()
+
+
+def _add_phase(name, elapsed_ns):
+    phases = getattr(_trace, "phases", None)
+    if phases is not None:
+        phases[name] = phases.get(name, 0) + elapsed_ns
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        if getattr(_trace, "phases", None) is None:
+            return super()._new_conn()
+        # resolve separately so DNS and TCP connect can be timed apart
+        s = time.perf_counter_ns()
+        try:
+            infos = socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)
+        except OSError:
+            return super()._new_conn()  # let urllib3 raise its usual resolution error
+        finally:
+            _add_phase("dns", time.perf_counter_ns() - s)
+        host, error = self._dns_host, None
+        s = time.perf_counter_ns()
+        try:
+            for address in dict.fromkeys(info[4][0] for info in infos):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except Exception as e:
+                    error = e
+            raise error
+        finally:
+            self._dns_host = host
+            _add_phase("connect", time.perf_counter_ns() - s)
+
+
+class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+    def connect(self):
+        phases = getattr(_trace, "phases", None)
+        if phases is None:
+            return super().connect()
+        before = phases.get("dns", 0) + phases.get("connect", 0)
+        s = time.perf_counter_ns()
+        try:
+            return super().connect()
+        finally:
+            after = phases.get("dns", 0) + phases.get("connect", 0)
+            _add_phase("tls", max(0, time.perf_counter_ns() - s - (after - before)))
+
+
+class CancellablePool:
+    # a connection checked out for a cancellable request is shut down when its run is cancelled
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        cancel = getattr(_trace, "cancel", None)
+        if cancel is not None:
+            conn.unwatch_cancel = cancel.on_cancel(partial(_abort_connection, conn))
+            # urllib3 drops a failed connection with _put_conn(None); the sender unhooks it then
+            _trace.hooks.append(conn.unwatch_cancel)
+        return conn
+
+    def _put_conn(self, conn):
+        unwatch = getattr(conn, "unwatch_cancel", None)
+        if unwatch is not None:
+            unwatch()
+            conn.unwatch_cancel = None
+        super()._put_conn(conn)
+
+
+class TimedHTTPConnectionPool(CancellablePool, HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(CancellablePool, HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+def start_timing():
+    _trace.phases = {}
+    return time.perf_counter_ns()
+
+
+def headers_timing(resp, started_ns, phases):
+    # ttfb covers sending the request and waiting for the response headers
+    now = time.perf_counter_ns()
+    setup = sum(phases.get(p, 0) for p in ("dns", "connect", "tls"))
+    resp.timings = {**phases, "ttfb": max(0, now - started_ns - setup)}
+    resp.timings_started = started_ns
+    resp.headers_at = now
+
+
+def finish_timing(resp):
+    if getattr(resp, "headers_at", None) is None:
+        return
+    now = time.perf_counter_ns()
+    resp.timings["transfer"] = now - resp.headers_at
+    resp.timings["total"] = now - resp.timings_started
+    resp.headers_at = None
+
+
+def timings_ms(resp):
+    timings = getattr(resp, "timings", None) or {}
+    return {k: round(v / 1e6, 3) for k, v in timings.items()}
+
+
+# --- Host limits ---
+# Every sender (sync, async, load workers) goes through the limit of its target host:
+# a token bucket for request rate and a FIFO semaphore for requests in flight.
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+# a load run whose requests queue this long behind the limit (as a share of latency) was paced by it
+HOST_LIMIT_BOUND = 0.1
+
+
+class HostLimit:
+    def __init__(self, rps=None, max_in_flight=None, burst=None):
+        self.rps = float(rps) if rps else None
+        self.max_in_flight = int(max_in_flight) if max_in_flight else None
+        # burst 1 spaces requests evenly at exactly `rps`
+        self.burst = max(1.0, float(burst or 1))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.waiters = deque()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        # takes a token and returns how long to wait for it; a deficit queues callers behind each other
+        if not self.rps:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rps)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rps
+
+    def _try_enter(self, waiter):
+        with self.lock:
+            if self.in_flight < self.max_in_flight and not self.waiters:
+                self.in_flight += 1
+                return True
+            self.waiters.append(waiter)
+            return False
+
+    def acquire(self, cancel=None):
+        delay = self.reserve()
+        if delay:
+            if cancel is not None:
+                cancel.wait(delay)
+                cancel.check()
+            else:
+                time.sleep(delay)
+        if not self.max_in_flight:
+            return
+        granted = threading.Event()
+        if self._try_enter(granted.set):
+            return
+        unwatch = cancel.on_cancel(granted.set) if cancel is not None else None
+        granted.wait()
+        if unwatch:
+            unwatch()
+        if cancel is not None and cancel.is_set():
+            with self.lock:
+                queued = granted.set in self.waiters
+                if queued:
+                    self.waiters.remove(granted.set)
+            if not queued:
+                self.release()
+            cancel.check()
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        if not self.max_in_flight:
+            return
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            # a slot handed to a waiter that was cancelled meanwhile goes straight back
+            if granted.cancelled():
+                self.release()
+            elif not granted.done():
+                granted.set_result(None)
+
+        waiter = partial(loop.call_soon_threadsafe, wake)
+        if self._try_enter(waiter):
+            return
+        try:
+            await granted
+        except asyncio.CancelledError:
+            with self.lock:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+            raise
+
+    def release(self):
+        if not self.max_in_flight:
+            return
+        with self.lock:
+            while self.waiters:
+                waiter = self.waiters.popleft()
+                try:
+                    waiter()  # the slot passes straight to the next waiter
+                    return
+                except RuntimeError:
+                    continue  # its event loop is gone
+            self.in_flight -= 1
+
+
+def set_host_limit(host, rps=None, max_in_flight=None, burst=None):
+    # host is a hostname (port ignored) or "*" for every host without its own limit; no limits removes it
+    host = (urlsplit(host).hostname if "://" in host else host.rsplit(":", 1)[0]).lower()
+    with _host_limits_lock:
+        if rps or max_in_flight:
+            _host_limits[host] = HostLimit(rps, max_in_flight, burst)
+        else:
+            _host_limits.pop(host, None)
+
+
+def clear_host_limits():
+    with _host_limits_lock:
+        _host_limits.clear()
+
+
+def configure_host_limits(text):
+    # one "HOST RPS [MAX_IN_FLIGHT]" per line, e.g. "api.partner.com 50 10" or "* 200"; RPS 0 = no rate cap
+    limits = []
+    for line in (text or "").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        host, *values = line.split()
+        if len(values) not in (1, 2):
+            raise ValueError(f"Host limit must be 'HOST RPS [MAX_IN_FLIGHT]': {line!r}")
+        limits.append((host, float(values[0]), int(values[1]) if len(values) > 1 else None))
+    apply_host_limits(limits)
+    return describe_host_limits()
+
+
+def host_limits_share(parts):
+    # the configured limits split evenly across `parts` senders (worker processes or remote nodes)
+    with _host_limits_lock:
+        items = sorted(_host_limits.items())
+    return [(host, limit.rps / parts if limit.rps else None,
+             max(1, limit.max_in_flight // parts) if limit.max_in_flight else None) for host, limit in items]
+
+
+def apply_host_limits(limits):
+    clear_host_limits()
+    for host, rps, max_in_flight in limits or ():
+        set_host_limit(host, rps, max_in_flight)
+
+
+def describe_host_limits():
+    with _host_limits_lock:
+        items = sorted(_host_limits.items())
+    if not items:
+        return "No host limits"
+    return "\n".join(f"{host}: {f'{limit.rps:g} req/s' if limit.rps else 'no rate cap'}, "
+                     f"{limit.max_in_flight or 'unlimited'} in flight" for host, limit in items)
+
+
+def host_limit(url):
+    if not _host_limits:
+        return None
+    host = (urlsplit(url).hostname or "").lower()
+    return _host_limits.get(host) or _host_limits.get("*")
+
+
+def release_host_slot(resp):
+    # streamed responses hold their host slot until the body has been read
+    release = getattr(resp, "release_host_slot", None)
+    if release is not None:
+        resp.release_host_slot = None
+        release()
+
+
+# --- Connection pool ---
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _pool_key(url):
+    parts = urlsplit(url)
+    scheme = (parts.scheme or "http").lower()
+    port = parts.port or (443 if scheme == "https" else 80)
+    return scheme, (parts.hostname or "").lower(), port
+
+
+def _new_session(pool_size=None):
+    session = requests.Session()
+    # checks must not leak cookies into each other (e.g. the no-auth half of test_security)
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    session.headers["Connection"] = "keep-alive"
+    retry = Retry(total=MAX_RETRIES, connect=MAX_RETRIES, read=0, backoff_factor=0.2, raise_on_status=False)
+    adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=pool_size or POOL_SIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session(url):
+    key = _pool_key(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = _new_session()
+    return session
+
+
+@contextmanager
+def load_sender(send, concurrency):
+    # a load run wider than the shared pool gets a session of its own, sized to its workers, so the
+    # pool other users and parallel checks share stays as it is; yields the send to run with
+    if concurrency <= POOL_SIZE:
+        yield send
+        return
+    session = _new_session(pool_size=concurrency)
+    run_send = partial(send, session=session)
+    try:
+        # the baseline warmed the shared pool; this warms the run's own
+        try:
+            run_send()
+        except Exception:
+            pass  # the run itself reports it
+        yield run_send
+    finally:
+        session.close()
+
+
+def close_sessions():
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def configure_pool(pool_size=None, max_retries=None, timeout=None):
+    global POOL_SIZE, MAX_RETRIES, REQUEST_TIMEOUT
+    if pool_size is not None:
+        POOL_SIZE = int(pool_size)
+    if max_retries is not None:
+        MAX_RETRIES = int(max_retries)
+    if timeout is not None:
+        REQUEST_TIMEOUT = float(timeout)
+    # existing sessions were built with the old adapter settings
+    close_sessions()
+
+
+def pooled_request(method, url, headers=None, data=None, files=None, stream=False, cancel=None, limit=True,
+                   session=None, **kwargs):
+    # limit=False skips the host limits, for the tester's own traffic (calibration) only;
+    # session overrides the shared per-host one (see load_sender)
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    if cancel is not None:
+        cancel.check()
+    limit = host_limit(url) if limit else None
+    if limit is not None:
+        queued = time.perf_counter_ns()
+        limit.acquire(cancel)
+        queued = time.perf_counter_ns() - queued
+    try:
+        resp = _pooled_send(method, url, headers, data, files, stream, cancel, session, kwargs)
+    except BaseException:
+        if limit is not None:
+            limit.release()
+        raise
+    if limit is not None:
+        # time spent behind our own limiter is the client's, not the server's
+        resp.limit_wait_ns = queued
+        if stream:
+            resp.release_host_slot = limit.release
+        else:
+            limit.release()
+    return resp
+
+
+def _pooled_send(method, url, headers, data, files, stream, cancel, session, kwargs):
+    headers, data, files, body = streamed_body(headers, data, files)
+    started = start_timing()
+    _trace.cancel = cancel
+    _trace.hooks = hooks = []
+    try:
+        try:
+            # always stream so headers and body transfer can be timed apart
+            resp = (session or get_session(url)).request(method=method, url=url, headers=headers, data=data, files=files,
+                                            stream=True, **kwargs)
+            headers_timing(resp, started, _trace.phases)
+        finally:
+            _trace.phases = _trace.cancel = None
+            if body is not None:
+                body.close()
+        if not stream:
+            resp.content
+            finish_timing(resp)
+    except Exception as e:
+        for unwatch in hooks:
+            unwatch()
+        # a connection torn down by cancel() surfaces as a protocol error; report it as the stop it was
+        if cancel is not None and cancel.is_set():
+            raise Cancelled("run stopped") from e
+        raise
+    return resp
+
+
+PATH_VARIABLE = re.compile(r'\{(\w+)\}|:(\w+)')
+
+
+@lru_cache(maxsize=1024)
+def compile_path_template(url):
+    # literal text alternates with (name, placeholder) pairs, so rendering is a single join
+    segments = []
+    variables = set()
+    pos = 0
+    for m in PATH_VARIABLE.finditer(url):
+        name = m.group(1) or m.group(2)
+        segments.append(url[pos:m.start()])
+        segments.append((name, m.group(0)))
+        variables.add(name)
+        pos = m.end()
+    segments.append(url[pos:])
+    return tuple(segments), frozenset(variables)
+
+
+def render_path_template(segments, values):
+    if len(segments) == 1:
+        return segments[0]
+    return "".join(seg if isinstance(seg, str) else values.get(seg[0], seg[1]) for seg in segments)
+
+
+def process_path_variables(url, params):
+    path_params = {}
+    new_params = []
+    segments, variables = compile_path_template(url)
+    for key, value in params or []:
+        if key and value:
+            key = safe_convert(key).strip()
+            value = safe_convert(value).strip()
+            if key in variables:
+                path_params[key] = value
+            else:
+                new_params.append([key, value])
+    return render_path_template(segments, path_params), new_params
+
+
+def prepare_request_args(method, url, params, headers, body_type=None,
+                         json_body=None, form_params=None,
+                         file_key=None, uploaded_file=None):
+    # 1) Path variables and filter params
+    resolved_url, filtered_params = process_path_variables(url, params)
+    params_dict = {k: v for k, v in filtered_params if k and v}
+
+    # 2) Headers
+    headers_dict = {}
+    for active, k, v in headers or []:
+        if active and k and v:
+            headers_dict[safe_convert(k).strip()] = safe_convert(v).strip()
+
+    # 3) Body
+    json_data = None
+    data = None
+    files = None
+    if method.upper() in ["POST", "PUT", "PATCH"]:
+        if body_type == "JSON" and json_body and json_body.strip():
+            json_data = json.loads(json_body)
+            headers_dict.setdefault("Content-Type", "application/json")
+        else:
+            data = {k: v for k, v in form_params or [] if k and v}
+            if uploaded_file and file_key and file_key.strip():
+                files = {file_key.strip(): FileSource(uploaded_file.name)}
+            else:
+                headers_dict.setdefault("Content-Type", "application/x-www-form-urlencoded")
+
+    return resolved_url, params_dict, headers_dict, json_data, data, files
+
+# --- Core request sender ---
+# Bodies over the in-memory cap are saved here. Only the newest SPILL_KEEP files younger than
+# SPILL_MAX_AGE are kept, and a process removes the files it wrote when it exits.
+SPILL_DIR = os.path.join(tempfile.gettempdir(), "fapi-bodies")
+SPILL_KEEP = 20
+SPILL_MAX_AGE = 3600
+SPILL_RETENTION = (f"kept for up to {SPILL_MAX_AGE // 60} minutes, only the {SPILL_KEEP} newest bodies, "
+                   f"and removed when the tester exits")
+_spilled = set()
+_spill_lock = threading.Lock()
+
+
+def prune_spills(keep=SPILL_KEEP, max_age=SPILL_MAX_AGE):
+    # makes room for one more spill file
+    try:
+        entries = [e for e in os.scandir(SPILL_DIR) if e.name.startswith("fapi-body-")]
+    except OSError:
+        return
+    stamped = []
+    for entry in entries:
+        try:
+            stamped.append((entry.stat().st_mtime, entry.path))
+        except OSError:
+            pass
+    stamped.sort(reverse=True)
+    cutoff = time.time() - max_age
+    for i, (mtime, path) in enumerate(stamped):
+        if i >= keep - 1 or mtime < cutoff:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # still open on Windows, or already gone
+
+
+def new_spill_file():
+    with _spill_lock:
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        prune_spills()
+        spill = tempfile.NamedTemporaryFile(prefix="fapi-body-", suffix=".bin", dir=SPILL_DIR, delete=False)
+        if not _spilled:
+            atexit.register(remove_spills)
+        _spilled.add(spill.name)
+    return spill
+
+
+def remove_spills():
+    with _spill_lock:
+        paths = list(_spilled)
+        _spilled.clear()
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class BodySink:
+    # keeps up to max_bytes in memory; past the cap the whole body is spilled to a temp file
+    def __init__(self, max_bytes=None):
+        self.max_bytes = MAX_BODY_BYTES if max_bytes is None else max_bytes
+        self.buffer = bytearray()
+        self.preview = b""
+        self.size = 0
+        self.spill = None
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.spill is None and self.size <= self.max_bytes:
+            self.buffer += chunk
+            return
+        if self.spill is None:
+            self.spill = new_spill_file()
+            self.preview = bytes(self.buffer[:PREVIEW_BYTES]) + chunk[:max(0, PREVIEW_BYTES - len(self.buffer))]
+            self.spill.write(self.buffer)
+            self.buffer = bytearray()
+        self.spill.write(chunk)
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+
+    def body(self):
+        if self.spill is None:
+            try:
+                return json_loads(self.buffer)
+            except ValueError:
+                return self.buffer.decode('utf-8', errors='replace')
+        return {
+            "truncated": True,
+            "size": self.size,
+            "saved_to": self.spill.name,
+            "retention": SPILL_RETENTION,
+            "preview": self.preview.decode('utf-8', errors='replace'),
+        }
+
+
+def read_body(resp, max_bytes=None):
+    sink = BodySink(max_bytes)
+    try:
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            sink.write(chunk)
+        finish_timing(resp)
+    finally:
+        resp.body_size = sink.size
+        sink.close()
+        resp.close()
+        release_host_slot(resp)
+    return sink.body()
+
+
+def format_exchange(method, original_url, resp, body, params_dict, headers_dict, body_type, json_data, data, files,
+                    compact=None):
+    # pretty-printing a multi-MB body costs more than receiving it, so large ones stay compact
+    compact = compact or getattr(resp, "body_size", 0) > COMPACT_OUTPUT_BYTES
+    return json_dumps({
+        "request": {
+            "method": method,
+            "url": original_url,
+            "resolved_url": str(resp.url),
+            "query_params": params_dict,
+            "headers": headers_dict,
+            "body_type": body_type,
+            "body": json_data if body_type == "JSON" else {"form_data": data, "files": list(files.keys()) if files else []}
+        },
+        "response": {"status": resp.status_code, "headers": dict(resp.headers), "body": body,
+                     "timings_ms": timings_ms(resp)}
+    }, pretty=not compact)
+
+
+def send_request(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file,
+                 max_body_mb=None, compact=None):
+    try:
+        resolved_url, params_dict, headers_dict, json_data, data, files = prepare_request_args(
+            method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file
+        )
+        resp = pooled_request(
+            method=method,
+            url=resolved_url,
+            params=params_dict,
+            headers=headers_dict,
+            json=json_data,
+            data=data,
+            files=files,
+            timeout=REQUEST_TIMEOUT,
+            stream=True
+        )
+        body = read_body(resp, body_cap(max_body_mb))
+        record_history("send", method, url, url=resolved_url, status=resp.status_code,
+                       elapsed_ms=timings_ms(resp).get("total"))
+        return format_exchange(method, url, resp, body, params_dict, headers_dict, body_type, json_data, data, files,
+                               compact)
+    except Exception as e:
+        record_history("send", method, url, summary=safe_convert(e))
+        return json.dumps({"error": "Request Error", "details": safe_convert(e)}, indent=2)
+
+
+def body_cap(max_body_mb):
+    # the UI passes megabytes, 0/empty means the default cap
+    return int(float(max_body_mb) * 1024 * 1024) if max_body_mb else None
+
+# --- Run context ---
+class RunContext:
+    # one prepared request and one baseline response shared by all checks of a run
+    def __init__(self, method, url, params=None, headers=None, body_type=None,
+                 json_body=None, form_params=None, file_key=None, uploaded_file=None, cancel=None, limit=True):
+        self.method = method
+        self.url = url
+        self.cancel = cancel or CancelToken()
+        # whether sends go through the host limits; only calibration probes skip them
+        self.limit = limit
+        # picklable copy of the raw inputs, for rebuilding the request in worker processes
+        upload = SimpleNamespace(name=uploaded_file.name) if uploaded_file else None
+        self.spec = (method, url, params, headers, body_type, json_body, form_params, file_key, upload)
+        (self.resolved_url, self.params, self.headers,
+         self.json, self.data, self.files) = prepare_request_args(
+            method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file
+        )
+        self._baseline = None
+        self.baseline_ms = None
+        self.baseline_bytes = None
+        self._lock = threading.Lock()
+        self._async_lock = None
+
+    def request_kwargs(self, headers=None):
+        return {"params": self.params, "headers": self.headers if headers is None else headers,
+                "json": self.json, "data": self.data, "files": self.files, "cancel": self.cancel,
+                "limit": self.limit}
+
+    def send(self, headers=None, session=None):
+        return pooled_request(self.method, self.resolved_url, session=session, **self.request_kwargs(headers))
+
+    async def send_async(self, headers=None):
+        return await async_request(self.method, self.resolved_url, **self.request_kwargs(headers))
+
+    def _store_baseline(self, resp=None, error=None):
+        self._baseline = (resp.status_code if resp is not None else None, error)
+        self.baseline_ms = timings_ms(resp).get("total") if resp is not None else None
+        self.baseline_bytes = len(resp.content) if resp is not None else None
+
+    def _baseline_status(self):
+        status, error = self._baseline
+        if error is not None:
+            raise error
+        return status
+
+    def baseline(self):
+        with self._lock:
+            if self._baseline is None:
+                try:
+                    self._store_baseline(self.send())
+                except Exception as e:
+                    self._store_baseline(error=e)
+        return self._baseline_status()
+
+    async def baseline_async(self):
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if self._baseline is None:
+                try:
+                    self._store_baseline(await self.send_async())
+                except Exception as e:
+                    self._store_baseline(error=e)
+        return self._baseline_status()
+
+
+# --- Test utilities ---
+def validate_status(method, url, params=None, headers=None, expected=200,
+                    body_type=None, json_body=None, form_params=None,
+                    file_key=None, uploaded_file=None, ctx=None):
+    ctx = ctx or RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+    status = ctx.baseline()
+    return (status == expected, status)
+
+def test_functional(method, url, params=None, headers=None,
+                    body_type=None, json_body=None, form_params=None,
+                    file_key=None, uploaded_file=None, ctx=None):
+    ctx = ctx or RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+    ok, status = validate_status(method, url, expected=200, ctx=ctx)
+    record_history("functional", method, url, url=ctx.resolved_url, status=status, ok=ok, elapsed_ms=ctx.baseline_ms)
+    return f"Functional: {method} {url} -> {status} ({'PASS' if ok else 'FAIL'})"
+
+def test_error_handling(method, url, params=None, headers=None,
+                        body_type=None, json_body=None, form_params=None,
+                        file_key=None, uploaded_file=None, ctx=None):
+    ctx = ctx or RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+    bad_url = ctx.resolved_url.rstrip('/') + "/nonexistent"
+    r = pooled_request(method="GET", url=bad_url,
+                       params=ctx.params, headers=ctx.headers, cancel=ctx.cancel)
+    record_history("error_handling", "GET", ctx.url, url=bad_url, status=r.status_code,
+                   ok=400 <= r.status_code < 500, elapsed_ms=timings_ms(r).get("total"))
+    return f"Error Handling: GET {bad_url} -> {r.status_code}"
+
+# --- Latency histogram ---
+class LatencyHistogram:
+    # HDR-style log-linear buckets over nanoseconds: 2**(SUB_BITS-1) linear sub-buckets
+    # per power of two keep the relative error under 1% with a few hundred buckets
+    SUB_BITS = 8
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.total_sq = 0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def _index(cls, value):
+        shift = max(0, value.bit_length() - cls.SUB_BITS)
+        half = 1 << (cls.SUB_BITS - 1)
+        return value if shift == 0 else shift * half + (value >> shift)
+
+    @classmethod
+    def _upper(cls, index):
+        half = 1 << (cls.SUB_BITS - 1)
+        if index < 2 * half:
+            return index
+        shift = index // half - 1
+        return ((index - shift * half + 1) << shift) - 1
+
+    def record(self, value_ns):
+        value_ns = max(0, int(value_ns))
+        idx = self._index(value_ns)
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.count += 1
+        self.total += value_ns
+        self.total_sq += value_ns * value_ns
+        self.min = value_ns if self.min is None else min(self.min, value_ns)
+        self.max = value_ns if self.max is None else max(self.max, value_ns)
+
+    def merge(self, other):
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def percentile(self, q):
+        if not self.count:
+            return 0
+        rank = max(1, math.ceil(q / 100.0 * self.count))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(self._upper(idx), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def stddev(self):
+        if self.count < 2:
+            return 0.0
+        var = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(0.0, var))
+
+    def to_dict(self):
+        return {"counts": {str(k): v for k, v in self.counts.items()}, "count": self.count,
+                "total": self.total, "total_sq": self.total_sq, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, d):
+        h = cls()
+        h.counts = {int(k): v for k, v in d["counts"].items()}
+        h.count, h.total, h.total_sq = d["count"], d["total"], d["total_sq"]
+        h.min, h.max = d["min"], d["max"]
+        return h
+
+    def summary(self, elapsed=None):
+        ms = lambda ns: f"{(ns or 0) / 1e6:.2f}ms"
+        text = (f"min {ms(self.min)} p50 {ms(self.percentile(50))} p90 {ms(self.percentile(90))} "
+                f"p99 {ms(self.percentile(99))} p999 {ms(self.percentile(99.9))} max {ms(self.max)} "
+                f"mean {ms(self.mean())} stddev {ms(self.stddev())}")
+        if elapsed:
+            text += f", {self.count / elapsed:.1f} req/s"
+        return text
+
+
+# --- Generator health ---
+# A load generator that is out of CPU measures its own queueing, not the server. While a run
+# is going, a side thread samples process CPU and how late its own timed waits wake up
+# (scheduling delay); async runs also time how late the event loop gets back to a sleeper.
+HEALTH_INTERVAL = 0.05
+# share of one core; the GIL keeps Python-level work on roughly one
+CPU_SATURATION = 0.9
+# judged on p90: a saturated generator is late on most wakeups, not on one unlucky one
+DELAY_SATURATION_MS = 10.0
+# below this many samples a p90 is just the worst wakeup, so nothing is flagged
+HEALTH_MIN_SAMPLES = 10
+HEALTH_KEYS = ("cpu_mean", "cpu_max", "delay_p90_ms", "delay_p99_ms", "delay_max_ms",
+               "loop_lag_p90_ms", "loop_lag_p99_ms", "loop_lag_max_ms")
+
+
+class HealthMonitor:
+    def __init__(self, interval=HEALTH_INTERVAL):
+        self.interval = interval
+        self.cpu = []
+        self.delay = LatencyHistogram()
+        self.loop_lag = LatencyHistogram()
+        self.done = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._sample, name="load-health", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.done.set()
+        self.thread.join()
+
+    def _sample(self):
+        step = int(self.interval * 1e9)
+        wall, cpu = time.perf_counter_ns(), time.process_time_ns()
+        while not self.done.wait(self.interval):
+            now, now_cpu = time.perf_counter_ns(), time.process_time_ns()
+            self.delay.record(now - wall - step)
+            self.cpu.append((now_cpu - cpu) / max(1, now - wall))
+            wall, cpu = now, now_cpu
+
+    async def probe_loop(self):
+        step = int(self.interval * 1e9)
+        while True:
+            s = time.perf_counter_ns()
+            await asyncio.sleep(self.interval)
+            self.loop_lag.record(time.perf_counter_ns() - s - step)
+
+    def last_cpu(self):
+        return self.cpu[-1] if self.cpu else None
+
+    def summary(self):
+        # plain numbers, so it travels with result_to_dict
+        ms = lambda h, q: round(h.percentile(q) / 1e6, 2) if h.count else None
+        health = {
+            "cpu_mean": round(sum(self.cpu) / len(self.cpu), 3) if self.cpu else None,
+            "cpu_max": round(max(self.cpu), 3) if self.cpu else None,
+            "delay_p90_ms": ms(self.delay, 90), "delay_p99_ms": ms(self.delay, 99), "delay_max_ms": ms(self.delay, 100),
+            "loop_lag_p90_ms": ms(self.loop_lag, 90), "loop_lag_p99_ms": ms(self.loop_lag, 99),
+            "loop_lag_max_ms": ms(self.loop_lag, 100),
+            "samples": len(self.cpu), "loop_samples": self.loop_lag.count,
+        }
+        health["suspect"] = health_warnings(health)
+        return health
+
+
+def health_warnings(health):
+    warnings = []
+    if (health.get("samples") or 0) >= HEALTH_MIN_SAMPLES:
+        if (health.get("cpu_mean") or 0) >= CPU_SATURATION:
+            warnings.append(f"CPU at {health['cpu_mean']:.0%} of a core")
+        if (health.get("delay_p90_ms") or 0) >= DELAY_SATURATION_MS:
+            warnings.append(f"threads woke {health['delay_p90_ms']:.1f}ms late (p90)")
+    if (health.get("loop_samples") or 0) >= HEALTH_MIN_SAMPLES and \
+            (health.get("loop_lag_p90_ms") or 0) >= DELAY_SATURATION_MS:
+        warnings.append(f"event loop lagged {health['loop_lag_p90_ms']:.1f}ms (p90)")
+    return warnings
+
+
+def merge_health(healths):
+    # the most loaded process or node decides whether the whole run is trustworthy
+    healths = [h for h in healths if h]
+    if not healths:
+        return None
+    peak = lambda key, hs: max((h[key] for h in hs if h.get(key) is not None), default=None)
+    merged = {key: peak(key, healths) for key in HEALTH_KEYS}
+    merged["samples"] = sum(h.get("samples") or 0 for h in healths)
+    merged["loop_samples"] = sum(h.get("loop_samples") or 0 for h in healths)
+    # each process is judged on its own samples: short-lived ones don't add up to a verdict
+    sampled = [h for h in healths if (h.get("samples") or 0) >= HEALTH_MIN_SAMPLES]
+    looped = [h for h in healths if (h.get("loop_samples") or 0) >= HEALTH_MIN_SAMPLES]
+    judged = {key: peak(key, looped if key.startswith("loop_") else sampled) for key in HEALTH_KEYS}
+    judged["samples"] = HEALTH_MIN_SAMPLES if sampled else 0
+    judged["loop_samples"] = HEALTH_MIN_SAMPLES if looped else 0
+    merged["suspect"] = health_warnings(judged)
+    return merged
+
+
+@contextmanager
+def monitoring(run):
+    run.health = HealthMonitor().start()
+    try:
+        yield run.health
+    finally:
+        run.health.stop()
+
+
+def format_health(health):
+    pct = lambda v: f"{v:.0%}" if v is not None else "-"
+    ms = lambda v: f"{v:.2f}ms" if v is not None else "-"
+    parts = []
+    if health.get("cpu_mean") is not None:
+        parts.append(f"cpu mean {pct(health['cpu_mean'])} max {pct(health['cpu_max'])} of a core, "
+                     f"scheduling delay p90 {ms(health['delay_p90_ms'])} p99 {ms(health['delay_p99_ms'])}")
+    if health.get("loop_lag_p99_ms") is not None:
+        parts.append(f"loop lag p90 {ms(health['loop_lag_p90_ms'])} p99 {ms(health['loop_lag_p99_ms'])}")
+    # a run shorter than one sampling interval has nothing to show
+    lines = [f"  generator: {', '.join(parts)}"] if parts else []
+    if health["suspect"]:
+        lines.append(f"  ⚠️ suspect results, the load generator was saturated: {'; '.join(health['suspect'])}. "
+                     f"Latencies include the tester's own queueing; use fewer workers or more processes")
+    return lines
+
+
+# --- Load generation ---
+LOAD_MODES = ("closed", "open")
+
+
+class LoadRun:
+    # shared by the thread and asyncio drivers: pacing, budget and stats, all under one lock
+    def __init__(self, concurrency=1, iterations=None, duration=None, target_rps=None, ramp_up=0.0, mode="closed",
+                 cancel=None):
+        if mode not in LOAD_MODES:
+            raise ValueError(f"Unknown load mode: {mode}")
+        if mode == "open" and not target_rps:
+            raise ValueError("open-loop mode needs a target RPS")
+        self.mode = mode
+        self.target_rps = target_rps
+        self.concurrency = max(1, int(concurrency or 1))
+        self.iterations = iterations if iterations or duration else self.concurrency
+        self.interval = 1.0 / target_rps if target_rps else 0.0
+        self.ramp_up = ramp_up or 0.0
+        # anything with is_set()/wait(): a CancelToken, or a multiprocessing Event in worker processes
+        self.cancel = cancel or CancelToken()
+        self.start = time.monotonic()
+        self.deadline = self.start + duration if duration else None
+        self.lock = threading.Lock()
+        self.issued = 0
+        self.next_at = self.start
+        self.histogram = LatencyHistogram()
+        self.health = None
+        self.service = LatencyHistogram()
+        self.limit_wait = LatencyHistogram()
+        self.statuses = {}
+        self.errors = {}
+        self.phases = {}
+        # requests finished since the last progress snapshot
+        self.window = LatencyHistogram()
+        self.window_start = self.start
+        # completions inside the run's window, for a throughput the post-deadline drain can't dilute
+        self.first_done = None
+        self.done_in_time = 0
+
+    def ramp_delay(self, index):
+        return 0.0 if self.mode == "open" else self.ramp_up * index / self.concurrency
+
+    def pause(self, seconds):
+        # sleeps, but returns early once the run is cancelled
+        if seconds > 0:
+            self.cancel.wait(seconds)
+
+    def take_slot(self):
+        # every worker reserves the next send time from one shared pacer
+        with self.lock:
+            if self.cancel.is_set() or (self.iterations and self.issued >= self.iterations):
+                return None
+            if self.mode == "open":
+                # fixed intended timeline: a late send keeps its original slot
+                slot = self.next_at
+                ramp = min(1.0, max(0.1, (slot - self.start) / self.ramp_up)) if self.ramp_up else 1.0
+                interval = self.interval / ramp
+            else:
+                slot = max(time.monotonic(), self.next_at)
+                interval = self.interval
+            # next_at sums float intervals: a slot a hair short of the deadline is the one at it
+            if self.deadline and slot >= self.deadline - 1e-9:
+                return None
+            self.next_at = slot + interval
+            self.issued += 1
+            return slot
+
+    def _completed(self):
+        # caller holds the lock
+        now = time.monotonic()
+        if self.first_done is None:
+            self.first_done = now
+        if not self.deadline or now <= self.deadline:
+            self.done_in_time += 1
+
+    def throughput(self):
+        # completions per second from the first response to the deadline (or now), so neither the
+        # first round trip nor the wait for in-flight requests after the deadline counts
+        end = min(time.monotonic(), self.deadline) if self.deadline else time.monotonic()
+        span = end - (self.first_done if self.first_done is not None else self.start)
+        return self.done_in_time / span if span > 0 else 0.0
+
+    def record(self, elapsed_ns, resp, service_ns=None):
+        timings = getattr(resp, "timings", None) or {}
+        wait = getattr(resp, "limit_wait_ns", None)
+        if wait is not None:
+            # the host limit's queue is reported on its own. Closed loop leaves it out of latency;
+            # open loop measures from the intended start, where every kind of queueing counts
+            if self.mode == "closed":
+                elapsed_ns = max(0, elapsed_ns - wait)
+            service_ns = max(0, service_ns - wait) if service_ns is not None else None
+        with self.lock:
+            self._completed()
+            if wait is not None:
+                self.limit_wait.record(wait)
+            self.histogram.record(elapsed_ns)
+            self.window.record(elapsed_ns)
+            if service_ns is not None:
+                self.service.record(service_ns)
+            self.statuses[resp.status_code] = self.statuses.get(resp.status_code, 0) + 1
+            for phase in TIMING_PHASES:
+                if phase in timings:
+                    self.phases.setdefault(phase, LatencyHistogram()).record(timings[phase])
+
+    def fail(self, e):
+        if self.cancel.is_set():
+            return  # requests torn down by the cancel aren't server errors
+        msg = safe_convert(e)
+        with self.lock:
+            self._completed()
+            self.errors[msg] = self.errors.get(msg, 0) + 1
+
+    def snapshot(self):
+        # progress so far; rate and p95 cover the window since the previous snapshot
+        now = time.monotonic()
+        with self.lock:
+            window, self.window = self.window, LatencyHistogram()
+            span, self.window_start = now - self.window_start, now
+            completed, errors = self.histogram.count, sum(self.errors.values())
+        return {"completed": completed, "errors": errors, "planned": self.iterations, "elapsed": now - self.start,
+                "rps": window.count / span if span > 0 else 0.0,
+                "p95": window.percentile(95) if window.count else None,
+                "cpu": self.health.last_cpu() if self.health else None}
+
+    def result(self):
+        return {"histogram": self.histogram, "statuses": self.statuses, "errors": self.errors, "phases": self.phases,
+                "elapsed": time.monotonic() - self.start, "concurrency": self.concurrency,
+                "mode": self.mode, "target_rps": self.target_rps, "service": self.service,
+                "limit_wait": self.limit_wait,
+                "cancelled": self.cancel.is_set(), "health": self.health.summary() if self.health else None,
+                "issued": self.issued, "throughput": self.throughput()}
+
+
+def open_loop_latency(slot, service_started_ns, run, resp):
+    # latency runs from the intended start, so time spent queued behind a stalled server counts
+    service_ns = time.perf_counter_ns() - service_started_ns
+    run.record(int((time.monotonic() - slot) * 1e9), resp, service_ns)
+
+
+@contextmanager
+def reporting(run, progress, interval=PROGRESS_INTERVAL):
+    # calls progress(run.snapshot()) from a side thread while the load runs
+    if progress is None:
+        yield
+        return
+    done = threading.Event()
+
+    def loop():
+        while not done.wait(interval):
+            progress(run.snapshot())
+
+    reporter = threading.Thread(target=loop, daemon=True)
+    reporter.start()
+    try:
+        yield
+    finally:
+        done.set()
+        reporter.join()
+
+
+def format_progress(snap):
+    done = f"{snap['completed']}/{snap['planned']}" if snap["planned"] else str(snap["completed"])
+    p95 = f"{snap['p95'] / 1e6:.2f}ms" if snap["p95"] is not None else "-"
+    cpu = f", cpu {snap['cpu']:.0%}" if snap.get("cpu") is not None else ""
+    return (f"Performance: running, {done} calls, {snap['errors']} errors, "
+            f"{snap['rps']:.1f} req/s, p95 {p95}{cpu} ({snap['elapsed']:.1f}s)")
+
+
+def run_load(send, concurrency=1, iterations=None, duration=None, target_rps=None, ramp_up=0.0, mode="closed",
+             progress=None, cancel=None):
+    run = LoadRun(concurrency, iterations, duration, target_rps, ramp_up, mode, cancel)
+    with reporting(run, progress), monitoring(run):
+        if run.mode == "open":
+            return _run_open_loop(send, run)
+        return _run_closed_loop(send, run)
+
+
+def _run_closed_loop(send, run):
+    def worker(index):
+        run.pause(run.ramp_delay(index))
+        while True:
+            slot = run.take_slot()
+            if slot is None:
+                return
+            run.pause(slot - time.monotonic())
+            if run.cancel.is_set():
+                return
+            s = time.perf_counter_ns()
+            try:
+                resp = send()
+            except Exception as e:
+                run.fail(e)
+                continue
+            run.record(time.perf_counter_ns() - s, resp)
+
+    with ThreadPoolExecutor(max_workers=run.concurrency) as pool:
+        list(pool.map(worker, range(run.concurrency)))
+    return run.result()
+
+
+def _run_open_loop(send, run):
+    # the dispatcher never waits for responses; concurrency only caps requests in flight
+    def job(slot):
+        s = time.perf_counter_ns()
+        try:
+            resp = send()
+        except Exception as e:
+            run.fail(e)
+            return
+        open_loop_latency(slot, s, run, resp)
+
+    with ThreadPoolExecutor(max_workers=run.concurrency) as pool:
+        while True:
+            slot = run.take_slot()
+            if slot is None:
+                break
+            run.pause(slot - time.monotonic())
+            if run.cancel.is_set():
+                break
+            pool.submit(job, slot)
+    return run.result()
+
+
+def load_options(iterations=5, concurrency=1, target_rps=None, ramp_up=0, duration=None, mode="closed",
+                 processes=1, workers=None, calibrate=False, worker_token=None):
+    # Gradio numbers arrive as floats and use 0 for "not set"
+    return {
+        "processes": max(1, int(processes or 1)),
+        "workers": parse_workers(workers),
+        "worker_token": worker_token or None,
+        "calibrate": bool(calibrate),
+        "iterations": int(iterations) if iterations else None,
+        "concurrency": max(1, int(concurrency or 1)),
+        "target_rps": float(target_rps) if target_rps else None,
+        "ramp_up": float(ramp_up or 0),
+        "duration": float(duration) if duration else None,
+        "mode": mode or "closed",
+    }
+
+
+def test_performance(method, url, params=None, headers=None,
+                     body_type=None, json_body=None, form_params=None,
+                     file_key=None, uploaded_file=None, iterations=5,
+                     concurrency=1, target_rps=None, ramp_up=0, duration=None, mode="closed",
+                     processes=1, workers=None, calibrate=False, worker_token=None, progress=None, ctx=None):
+    ctx = ctx or RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+    opts = load_options(iterations, concurrency, target_rps, ramp_up, duration, mode, processes, workers,
+                        calibrate, worker_token)
+    processes = opts.pop("processes")
+    workers = opts.pop("workers")
+    worker_token = opts.pop("worker_token")
+    calibrate = opts.pop("calibrate")
+    # the shared baseline doubles as warm-up, so the first timed call doesn't pay the handshake
+    ctx.baseline()
+    # remote nodes run on other hardware, so a local calibration says nothing about them
+    calibration = calibrate_client(ctx, opts["concurrency"], processes) if calibrate and not workers else None
+    if workers:
+        result = run_load_distributed(request_spec(ctx), workers, worker_token, cancel=ctx.cancel, **opts)
+    elif processes > 1:
+        result = run_load_processes(ctx.spec, processes, cancel=ctx.cancel, **opts)
+    else:
+        with load_sender(ctx.send, opts["concurrency"]) as send:
+            result = run_load(send, progress=progress, cancel=ctx.cancel, **opts)
+    result["calibration"] = calibration
+    return load_report(ctx, result)
+
+
+def format_load_result(result):
+    hist = result["histogram"]
+    errors = sum(result["errors"].values())
+    if not hist.count:
+        stopped = ", stopped early" if result.get("cancelled") else ""
+        return f"Performance: no successful calls ({errors} errors{stopped})"
+    statuses = ", ".join(f"{k}: {v}" for k, v in sorted(result["statuses"].items()))
+    model = (f"open-loop at {result['target_rps']:g} req/s, up to {result['concurrency']} in flight"
+             if result.get("mode") == "open" else f"{result['concurrency']} workers")
+    if result.get("processes", 1) > 1:
+        model += f" across {result['processes']} processes"
+    if result.get("workers"):
+        model += f" on {result['workers']} remote node(s)"
+    stopped = " (stopped early)" if result.get("cancelled") else ""
+    health = result.get("health")
+    suspect = " [SUSPECT: load generator saturated]" if health and health["suspect"] else ""
+    lines = [f"Performance: {hist.count} calls with {model} in {result['elapsed']:.2f}s{stopped}, "
+             f"{errors} errors [{statuses}]{suspect}", f"  {hist.summary(result['elapsed'])}"]
+    if result.get("mode") == "open":
+        lines.append(f"  service time (excludes queueing): {result['service'].summary()}")
+    wait = result.get("limit_wait")
+    if wait is not None and wait.count:
+        counted = ("included in latency, which runs from the intended start" if result.get("mode") == "open"
+                   else "not counted as latency")
+        lines.append(f"  host limit: queued mean {wait.mean() / 1e6:.2f}ms p99 {wait.percentile(99) / 1e6:.2f}ms "
+                     f"per request, {counted}")
+        if wait.mean() >= HOST_LIMIT_BOUND * hist.mean():
+            lines.append("  ⚠️ the host limit, not the server, bounded this run's rate")
+    if result.get("calibration"):
+        lines += format_calibration(result)
+    if health:
+        lines += format_health(health)
+    phases = result.get("phases") or {}
+    if phases:
+        lines.append("  phases: " + "; ".join(
+            f"{name} mean {phases[name].mean() / 1e6:.2f}ms p99 {phases[name].percentile(99) / 1e6:.2f}ms"
+            for name in TIMING_PHASES if name in phases))
+    return "\n".join(lines)
+
+# --- Multi-process load ---
+def result_to_dict(result):
+    # plain, JSON-safe form of a load result for shipping between processes or hosts
+    return {
+        "histogram": result["histogram"].to_dict(),
+        "service": result["service"].to_dict(),
+        "limit_wait": result["limit_wait"].to_dict(),
+        "phases": {k: h.to_dict() for k, h in result["phases"].items()},
+        "statuses": {str(k): v for k, v in result["statuses"].items()},
+        "errors": dict(result["errors"]),
+        "elapsed": result["elapsed"],
+        "concurrency": result["concurrency"],
+        "mode": result["mode"],
+        "target_rps": result["target_rps"],
+        "cancelled": result.get("cancelled", False),
+        "health": result.get("health"),
+        "issued": result.get("issued"),
+        "throughput": result.get("throughput"),
+    }
+
+
+def result_from_dict(d):
+    return {
+        "histogram": LatencyHistogram.from_dict(d["histogram"]),
+        "service": LatencyHistogram.from_dict(d["service"]),
+        "limit_wait": LatencyHistogram.from_dict(d["limit_wait"]),
+        "phases": {k: LatencyHistogram.from_dict(h) for k, h in d["phases"].items()},
+        "statuses": {int(k): v for k, v in d["statuses"].items()},
+        "errors": dict(d["errors"]),
+        "elapsed": d["elapsed"],
+        "concurrency": d["concurrency"],
+        "mode": d["mode"],
+        "target_rps": d["target_rps"],
+        "cancelled": d.get("cancelled", False),
+        "health": d.get("health"),
+        "issued": d.get("issued"),
+        "throughput": d.get("throughput"),
+    }
+
+
+def merge_results(results):
+    merged = {"histogram": LatencyHistogram(), "service": LatencyHistogram(), "limit_wait": LatencyHistogram(),
+              "phases": {},
+              "statuses": {}, "errors": {}, "elapsed": 0.0, "concurrency": 0,
+              "mode": results[0]["mode"] if results else "closed", "target_rps": None,
+              "issued": 0, "throughput": 0.0}
+    for r in results:
+        merged["histogram"].merge(r["histogram"])
+        merged["service"].merge(r["service"])
+        merged["limit_wait"].merge(r["limit_wait"])
+        for name, h in r["phases"].items():
+            merged["phases"].setdefault(name, LatencyHistogram()).merge(h)
+        for key in ("statuses", "errors"):
+            for k, v in r[key].items():
+                merged[key][k] = merged[key].get(k, 0) + v
+        # workers run side by side, so the slowest one bounds the wall time
+        merged["elapsed"] = max(merged["elapsed"], r["elapsed"])
+        merged["concurrency"] += r["concurrency"]
+        if r["target_rps"]:
+            merged["target_rps"] = (merged["target_rps"] or 0) + r["target_rps"]
+        merged["cancelled"] = merged.get("cancelled", False) or r.get("cancelled", False)
+        # shares send at the same time, so their in-window rates add up
+        merged["issued"] += r.get("issued") or 0
+        merged["throughput"] += r.get("throughput") or 0.0
+    merged["health"] = merge_health([r.get("health") for r in results])
+    return merged
+
+
+def split_load(parts, concurrency=1, iterations=None, target_rps=None, **opts):
+    # divides one load profile into `parts` shares; never more shares than workers
+    parts = max(1, min(int(parts), int(concurrency or 1)))
+    shares = []
+    for i in range(parts):
+        share = dict(opts, concurrency=concurrency // parts + (i < concurrency % parts))
+        if iterations:
+            share["iterations"] = iterations // parts + (i < iterations % parts)
+            if not share["iterations"]:
+                continue
+        share["target_rps"] = target_rps / parts if target_rps else None
+        shares.append(share)
+    return shares
+
+
+_process_cancel = None
+
+
+def init_process_worker(cancel, limits=None):
+    global _process_cancel
+    _process_cancel = cancel
+    apply_host_limits(limits)
+
+
+@contextmanager
+def bridged_cancel(event, interval=0.05):
+    # a CancelToken that follows a multiprocessing Event, so a stop also aborts open connections
+    token = CancelToken()
+    done = threading.Event()
+
+    def watch():
+        while not done.is_set():
+            if event.wait(interval):
+                token.cancel()
+                return
+
+    watcher = threading.Thread(target=watch, name="cancel-bridge", daemon=True)
+    watcher.start()
+    try:
+        yield token
+    finally:
+        done.set()
+        watcher.join()
+
+
+def process_load_worker(spec, opts):
+    # runs in a child process with its own pooled sessions; only histograms and counters go back
+    with bridged_cancel(_process_cancel) as cancel:
+        ctx = RunContext(*spec, cancel=cancel)
+        try:
+            ctx.baseline()
+        except Cancelled:
+            pass  # the run below sees the cancel too and reports an empty, stopped share
+        with load_sender(ctx.send, opts["concurrency"]) as send:
+            return result_to_dict(run_load(send, cancel=cancel, **opts))
+
+
+def run_load_processes(spec, processes, cancel=None, **opts):
+    shares = split_load(processes, **opts)
+    # spawn keeps children clear of the parent's threads (Gradio, connection pools)
+    mp_context = multiprocessing.get_context("spawn")
+    stop = mp_context.Event()
+    unwatch = cancel.on_cancel(stop.set) if cancel is not None else None
+    try:
+        with ProcessPoolExecutor(max_workers=len(shares), mp_context=mp_context,
+                                 initializer=init_process_worker,
+                                 initargs=(stop, host_limits_share(len(shares)))) as pool:
+            results = list(pool.map(process_load_worker, [spec] * len(shares), shares))
+    finally:
+        if unwatch:
+            unwatch()
+    merged = merge_results([result_from_dict(r) for r in results])
+    merged["processes"] = len(shares)
+    return merged
+
+
+# --- Distributed load ---
+# The controller sends one JSON line {"op": "run", "token": ..., "request": ..., "load": ..., "limits": ...} per
+# run and the worker answers with {"op": "result", "result": ...} or {"op": "error", "error": ...}.
+# Uploads follow the run line as raw bytes, file after file in the order of request.files, each
+# exactly its "size" long, so neither side holds a whole file in memory.
+# {"op": "cancel"} on the same connection stops the run early; the partial result still comes back.
+# A worker fires arbitrary requests for whoever connects, so off loopback it needs a shared token.
+# The token travels in clear text: it keeps strangers out, but it is not encryption.
+def parse_workers(workers):
+    # "host:port, host" from the UI/CLI -> [(host, port)]
+    if not workers:
+        return []
+    if isinstance(workers, str):
+        workers = workers.replace(",", " ").split()
+    parsed = []
+    for worker in workers:
+        if isinstance(worker, str):
+            host, _, port = worker.rpartition(":") if ":" in worker else (worker, "", "")
+            worker = (host, int(port or WORKER_PORT))
+        parsed.append(tuple(worker))
+    return parsed
+
+
+def request_spec(ctx):
+    # the prepared request as plain JSON; uploads are described here and streamed after it since
+    # workers don't share our disk ("path" stays on this side)
+    files = {name: {"filename": source.filename, "content_type": source.content_type, "size": source.size(),
+                    "path": source.path}
+             for name, source in (ctx.files or {}).items()}
+    return {"method": ctx.method, "url": ctx.resolved_url, "params": ctx.params, "headers": ctx.headers,
+            "json": ctx.json, "data": ctx.data, "files": files}
+
+
+def send_uploads(stream, files):
+    # controller side: each upload's bytes, exactly as long as announced
+    for f in files.values():
+        remaining = f["size"]
+        with open(f["path"], 'rb') as src:
+            while remaining:
+                chunk = src.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise ValueError(f"{f['filename']} shrank while it was being sent")
+                stream.write(chunk)
+                remaining -= len(chunk)
+
+
+def receive_uploads(stream, files, tmpdir):
+    # worker side: the uploads that follow a run line, spooled to tmpdir
+    sources = {}
+    for i, (name, f) in enumerate(files.items()):
+        path = os.path.join(tmpdir, str(i))
+        remaining = int(f["size"])
+        with open(path, 'wb') as out:
+            while remaining:
+                chunk = stream.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise ConnectionError("controller closed the connection mid-upload")
+                out.write(chunk)
+                remaining -= len(chunk)
+        sources[name] = FileSource(path, f["filename"], f["content_type"])
+    return sources
+
+
+def run_spec_load(spec, opts, cancel=None, limits=None, files=None):
+    # worker side: rebuild the request from the spec, warm up and run the local load loop
+    cancel = cancel or CancelToken()
+    if limits is not None:
+        # the controller's host limits, already divided between its workers
+        apply_host_limits(limits)
+    send = partial(pooled_request, spec["method"], spec["url"], params=spec["params"],
+                   headers=spec["headers"], json=spec["json"], data=spec["data"], files=files or None, cancel=cancel)
+    send()
+    with load_sender(send, opts["concurrency"]) as send:
+        return result_to_dict(run_load(send, cancel=cancel, **opts))
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # the run goes on a thread so this loop keeps reading and can see a cancel
+        self.write_lock = threading.Lock()
+        cancel, runner = CancelToken(), None
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                msg = json_loads(line)
+                if msg.get("op") == "cancel":
+                    cancel.cancel()
+                elif msg.get("op") == "run" and runner is None:
+                    runner = self.start_run(msg, cancel)
+                else:
+                    raise ValueError(f"unexpected op {msg.get('op')!r}")
+            except Exception as e:
+                self.reply({"op": "error", "error": safe_convert(e)})
+                if runner is None:
+                    break  # a refused or broken run line may be followed by upload bytes; stop reading
+        # controller gone: nobody is left to read the result
+        cancel.cancel()
+        if runner is not None:
+            runner.join()
+
+    def start_run(self, msg, cancel):
+        if not self.server.accepts(msg.get("token")):
+            raise PermissionError("worker token missing or wrong")
+        uploads = msg["request"].get("files") or {}
+        tmpdir = tempfile.mkdtemp(prefix="fapi-worker-") if uploads else None
+        try:
+            files = receive_uploads(self.rfile, uploads, tmpdir) if uploads else None
+        except BaseException:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+        runner = threading.Thread(target=self.run, args=(msg, cancel, files, tmpdir), daemon=True)
+        runner.start()
+        return runner
+
+    def run(self, msg, cancel, files=None, tmpdir=None):
+        try:
+            result = run_spec_load(msg["request"], msg["load"], cancel, msg.get("limits"), files)
+            reply = {"op": "result", "result": result}
+        except Exception as e:
+            reply = {"op": "error", "error": safe_convert(e)}
+        finally:
+            if tmpdir:
+                shutil.rmtree(tmpdir, ignore_errors=True)
+        self.reply(reply)
+
+    def reply(self, msg):
+        with self.write_lock:
+            try:
+                self.wfile.write(json_dumps(msg, pretty=False).encode() + b"\n")
+                self.wfile.flush()
+            except OSError:
+                pass
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    token = None
+
+    def accepts(self, token):
+        if not self.token:
+            return True
+        return isinstance(token, str) and hmac.compare_digest(token.encode(), self.token.encode())
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # "" and "0.0.0.0" style wildcards, or a name that may resolve anywhere
+
+
+def resolve_worker_token(token=None):
+    return token or os.environ.get(WORKER_TOKEN_ENV) or None
+
+
+def serve_worker(host="127.0.0.1", port=WORKER_PORT, token=None):
+    # blocks; binds to localhost unless told otherwise since any controller may drive it
+    token = resolve_worker_token(token)
+    if not token and not is_loopback(host):
+        raise ValueError(f"a worker bound to {host or 'all interfaces'} needs a token "
+                         f"(--token or {WORKER_TOKEN_ENV}); without one, bind to 127.0.0.1")
+    with WorkerServer((host, port), WorkerHandler) as server:
+        server.token = token
+        server.serve_forever()
+
+
+def _send_cancel(sock):
+    try:
+        sock.sendall(b'{"op": "cancel"}\n')
+    except OSError:
+        pass
+
+
+def call_worker(worker, spec, opts, cancel=None, limits=None, token=None):
+    host, port = worker
+    with socket.create_connection((host, port), timeout=REQUEST_TIMEOUT) as sock:
+        # a run takes as long as it takes; only the connect is bounded
+        sock.settimeout(None)
+        with sock.makefile("rwb") as stream:
+            # the worker gets the upload's name, type and size; the bytes follow the line
+            header = dict(spec, files={name: {k: v for k, v in f.items() if k != "path"}
+                                       for name, f in spec["files"].items()})
+            stream.write(json_dumps({"op": "run", "token": token, "request": header, "load": opts, "limits": limits},
+                                    pretty=False).encode() + b"\n")
+            try:
+                send_uploads(stream, spec["files"])
+                stream.flush()
+            except OSError:
+                pass  # a worker that refuses the run hangs up mid-upload; its reply line says why
+            unwatch = cancel.on_cancel(partial(_send_cancel, sock)) if cancel is not None else None
+            try:
+                line = stream.readline()
+            finally:
+                if unwatch:
+                    unwatch()
+    if not line:
+        raise ConnectionError(f"worker {host}:{port} closed the connection")
+    reply = json_loads(line)
+    if reply.get("op") != "result":
+        raise RuntimeError(f"worker {host}:{port}: {reply.get('error')}")
+    return result_from_dict(reply["result"])
+
+
+def run_load_distributed(spec, workers, token=None, cancel=None, **opts):
+    shares = split_load(len(workers), **opts)
+    workers = workers[:len(shares)]
+    call = partial(call_worker, cancel=cancel, limits=host_limits_share(len(shares)), token=resolve_worker_token(token))
+    with ThreadPoolExecutor(max_workers=len(shares)) as pool:
+        results = list(pool.map(call, workers, [spec] * len(shares), shares))
+    merged = merge_results(results)
+    merged["workers"] = len(shares)
+    return merged
+
+
+# --- Local stand-in server ---
+# An in-process HTTP server with a fixed delay and response size, so the tester's own cost
+# can be measured apart from any real backend. It echoes request bodies back.
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # small responses would otherwise wait on delayed ACKs and add ~40ms per call
+    disable_nagle_algorithm = True
+
+    def handle_one(self):
+        size = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(size) if size else self.server.payload
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(404 if self.path.split("?", 1)[0].endswith("/nonexistent") else 200)
+        self.send_header("Content-Type", self.headers.get("Content-Type", "application/json") if size else "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_OPTIONS = handle_one
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, payload_bytes=1024, host="127.0.0.1", port=0):
+        super().__init__((host, port), StandInHandler)
+        self.latency = float(latency or 0)
+        # a JSON document of exactly payload_bytes, so body parsing is part of what's measured
+        pad = max(0, int(payload_bytes) - len(b'{"data":""}'))
+        self.payload = b'{"data":"' + b"x" * pad + b'"}'
+        self.url = f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, name="stand-in", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+# --- Calibration ---
+# The same request sent to a zero-delay stand-in shows what the tester itself costs per call
+# and how many calls per second it can generate at all. The stand-in runs in this process,
+# so the ceiling it finds is on the conservative side.
+CALIBRATION_SECONDS = 1.0
+# runs at or past this share of the client's ceiling measure the tester as much as the server
+CEILING_WARNING = 0.8
+
+
+def calibration_context(ctx, base):
+    # same method, params, headers and body as ctx, aimed at the stand-in; host limits are for the
+    # target, so they neither cap the probes nor spend the run's tokens on them
+    method, url, *rest = ctx.spec
+    parts = urlsplit(url)
+    return RunContext(method, base + parts.path + (f"?{parts.query}" if parts.query else ""), *rest,
+                      cancel=ctx.cancel, limit=False)
+
+
+def calibration_result(single, full, concurrency, processes):
+    return {
+        "overhead": single["histogram"].percentile(50),
+        "ceiling_rps": processes * full["histogram"].count / full["elapsed"] if full["elapsed"] else 0.0,
+        "concurrency": concurrency,
+    }
+
+
+def calibrate_client(ctx, concurrency=1, processes=1, seconds=CALIBRATION_SECONDS):
+    # one call at a time gives the per-request overhead, the full worker count gives the ceiling;
+    # with several processes one of them is measured and the ceiling scaled up
+    per_process = max(1, math.ceil(concurrency / processes))
+    with StandInServer(0, ctx.baseline_bytes or 1024) as server:
+        probe = calibration_context(ctx, server.url)
+        probe.baseline()
+        single = run_load(probe.send, duration=seconds / 2, cancel=ctx.cancel)
+        with load_sender(probe.send, per_process) as send:
+            full = (run_load(send, concurrency=per_process, duration=seconds / 2, cancel=ctx.cancel)
+                    if per_process > 1 else single)
+    return calibration_result(single, full, concurrency, processes)
+
+
+async def calibrate_client_async(ctx, concurrency=1, seconds=CALIBRATION_SECONDS):
+    with StandInServer(0, ctx.baseline_bytes or 1024) as server:
+        probe = calibration_context(ctx, server.url)
+        await probe.baseline_async()
+        single = await run_load_async(probe.send_async, duration=seconds / 2, cancel=ctx.cancel)
+        full = (await run_load_async(probe.send_async, concurrency=concurrency, duration=seconds / 2,
+                                     cancel=ctx.cancel) if concurrency > 1 else single)
+    return calibration_result(single, full, concurrency, 1)
+
+
+def format_calibration(result):
+    cal, hist = result["calibration"], result["histogram"]
+    over = cal["overhead"]
+    net = lambda ns: f"{max(0, ns - over) / 1e6:.2f}ms"
+    lines = [f"  client overhead {over / 1e6:.2f}ms/request, ceiling ~{cal['ceiling_rps']:.0f} req/s "
+             f"at {cal['concurrency']} workers; server latency net of overhead: p50 {net(hist.percentile(50))} "
+             f"p99 {net(hist.percentile(99))} mean {net(hist.mean())}"]
+    offered = max(hist.count / result["elapsed"] if result["elapsed"] else 0, result.get("target_rps") or 0)
+    if cal["ceiling_rps"] and offered >= CEILING_WARNING * cal["ceiling_rps"]:
+        lines.append(f"  ⚠️ {offered:.0f} req/s is {offered / cal['ceiling_rps']:.0%} of what this client can "
+                     f"generate; the tester may be the bottleneck, not the server")
+    return lines
+
+
+def test_security(method, url, params=None, headers=None,
+                  body_type=None, json_body=None, form_params=None,
+                  file_key=None, uploaded_file=None, ctx=None):
+    ctx = ctx or RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+
+    status_with_auth = ctx.baseline()
+
+    headers_dict_no_auth = ctx.headers.copy()
+    headers_dict_no_auth.pop("Authorization", None)
+
+    status_no_auth = ctx.send(headers=headers_dict_no_auth).status_code
+
+    record_history("security", ctx.method, ctx.url, url=ctx.resolved_url, status=status_no_auth,
+                   ok=status_with_auth != status_no_auth)
+    if status_with_auth != status_no_auth:
+        return f"Security: Missing auth -> {status_no_auth} (Expected: {status_with_auth}) ✅"
+    else:
+        return f"Security: No auth -> {status_no_auth} ⚠️ Check endpoint access control"
+
+
+# --- History ---
+# Once turned on with configure_history() (the UI and the CLI do), every send and check is
+# recorded in a local SQLite file. Inserts are queued and written in batches by one background
+# thread, so recording never waits on disk. Plain library use records nothing.
+HISTORY_DB = os.path.join(os.path.expanduser("~"), ".fapi", "history.db")
+HISTORY_BATCH = 500
+HISTORY_COLUMNS = ("time", "kind", "method", "endpoint", "url", "status", "ok", "elapsed_ms",
+                   "calls", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "summary")
+HISTORY_DAILY_COLUMNS = ("day", "kind", "runs", "avg_ms", "max_ms", "avg_p95_ms", "max_p95_ms", "errors")
+_history = None
+_history_path = None  # None: not configured, "": turned off
+_history_lock = threading.Lock()
+
+
+class HistoryStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            ts REAL NOT NULL,
+            kind TEXT NOT NULL,
+            method TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            url TEXT,
+            status INTEGER,
+            ok INTEGER,
+            elapsed_ms REAL,
+            calls INTEGER,
+            errors INTEGER,
+            rps REAL,
+            p50_ms REAL,
+            p95_ms REAL,
+            p99_ms REAL,
+            summary TEXT
+        );
+        CREATE INDEX IF NOT EXISTS runs_endpoint ON runs (endpoint, method, ts);
+        CREATE INDEX IF NOT EXISTS runs_method ON runs (method, ts);
+        CREATE INDEX IF NOT EXISTS runs_status ON runs (status, ts);
+        CREATE INDEX IF NOT EXISTS runs_ts ON runs (ts);
+    """
+    INSERT = (f"INSERT INTO runs (ts, {', '.join(HISTORY_COLUMNS[1:])}) "
+              f"VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})")
+
+    def __init__(self, path=HISTORY_DB, batch_size=HISTORY_BATCH):
+        self.path = path
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self.connect()) as db:
+            # WAL lets the UI read while the writer appends
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(self.SCHEMA)
+        self.writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def record(self, kind, method, endpoint, url=None, status=None, ok=None, elapsed_ms=None,
+               calls=None, errors=None, rps=None, p50_ms=None, p95_ms=None, p99_ms=None, summary=None):
+        self.queue.put_nowait((time.time(), kind, method, endpoint, url, status,
+                               None if ok is None else int(bool(ok)), elapsed_ms,
+                               calls, errors, rps, p50_ms, p95_ms, p99_ms, summary))
+
+    def _write_loop(self):
+        db = self.connect()
+        db.execute("PRAGMA synchronous=NORMAL")
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            stopping = len(rows) < len(batch)
+            try:
+                with db:
+                    db.executemany(self.INSERT, rows)
+            except sqlite3.Error:
+                pass  # history is best effort; a locked or full disk must not break runs
+            for _ in batch:
+                self.queue.task_done()
+        db.close()
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        self.queue.put_nowait(None)
+        self.writer.join()
+
+    def _where(self, endpoint=None, method=None, status=None, kind=None, since=None):
+        clauses, args = [], []
+        if endpoint:
+            # prefix match written as a range so it can use the endpoint index
+            clauses.append("endpoint >= ? AND endpoint < ?")
+            args += [endpoint, endpoint + "\U0010ffff"]
+        for column, value in (("method", method), ("status", status), ("kind", kind)):
+            if value:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if since:
+            clauses.append("ts >= ?")
+            args.append(since)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    def query(self, endpoint=None, method=None, status=None, kind=None, since=None, limit=200):
+        where, args = self._where(endpoint, method, status, kind, since)
+        with closing(self.connect()) as db:
+            return db.execute(f"SELECT ts, {', '.join(HISTORY_COLUMNS[1:])} FROM runs{where} "
+                              f"ORDER BY ts DESC LIMIT ?", args + [int(limit)]).fetchall()
+
+    def daily(self, endpoint=None, method=None, status=None, kind=None, since=None):
+        where, args = self._where(endpoint, method, status, kind, since)
+        with closing(self.connect()) as db:
+            return db.execute(
+                "SELECT date(ts, 'unixepoch', 'localtime') AS day, kind, COUNT(*), ROUND(AVG(elapsed_ms), 2), "
+                "ROUND(MAX(elapsed_ms), 2), ROUND(AVG(p95_ms), 2), ROUND(MAX(p95_ms), 2), "
+                f"SUM(COALESCE(errors, status IS NULL)) FROM runs{where} "
+                "GROUP BY day, kind ORDER BY day DESC, kind", args).fetchall()
+
+
+def configure_history(path=HISTORY_DB, override=True):
+    # an empty path turns recording off; override=False leaves an earlier choice alone
+    global _history, _history_path
+    with _history_lock:
+        if not override and _history_path is not None:
+            return
+        old, _history, _history_path = _history, None, path
+    if old is not None:
+        old.close()
+
+
+def get_history():
+    global _history
+    if not _history_path:
+        return None
+    with _history_lock:
+        if _history is None:
+            _history = HistoryStore(_history_path)
+            # pending rows are written before the interpreter exits
+            atexit.register(_history.close)
+        return _history
+
+
+def record_history(kind, method, endpoint, **fields):
+    try:
+        store = get_history()
+        if store is not None:
+            store.record(kind, method, endpoint, **fields)
+    except (OSError, sqlite3.Error):
+        pass  # can't open the database; runs go on without history
+
+
+def load_report(ctx, result):
+    # records a finished load run and returns its text report
+    hist = result["histogram"]
+    ms = lambda ns: round(ns / 1e6, 3) if ns is not None else None
+    errors = sum(result["errors"].values())
+    report = format_load_result(result)
+    record_history("performance", ctx.method, ctx.url, url=ctx.resolved_url, calls=hist.count, errors=errors,
+                   elapsed_ms=ms(hist.mean()) if hist.count else None,
+                   rps=round(hist.count / result["elapsed"], 2) if result["elapsed"] else None,
+                   p50_ms=ms(hist.percentile(50)) if hist.count else None,
+                   p95_ms=ms(hist.percentile(95)) if hist.count else None,
+                   p99_ms=ms(hist.percentile(99)) if hist.count else None,
+                   summary=report.split("\n", 1)[0])
+    return report
+
+
+def search_history(endpoint=None, method=None, days=7, status=None, kind=None, limit=200):
+    # rows for the History tab / CLI: (per-day aggregates, latest runs)
+    store = get_history()
+    if store is None:
+        return [], []
+    since = time.time() - float(days) * 86400 if days else None
+    method = method.upper() if method else None
+    status = int(status) if status else None
+    rows = [(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row[0])),) + tuple(row[1:])
+            for row in store.query(endpoint, method, status, kind, since, limit)]
+    return [list(r) for r in store.daily(endpoint, method, status, kind, since)], [list(r) for r in rows]
+
+
+# --- Capacity search ---
+# Offered load goes up in steps of open-loop traffic, each held long enough to settle, until
+# p99 or the error rate breaks the SLO or the target falls behind the offered rate. A binary
+# search between the last good step and the first bad one then narrows the knee.
+CAPACITY_HOLD = 10.0
+CAPACITY_REFINE = 3
+CAPACITY_IN_FLIGHT = 100
+# achieved below this share of the offered rate means requests are piling up
+CAPACITY_KEEP_UP = 0.95
+
+
+def capacity_step(ctx, rate, hold, max_in_flight, processes=1, workers=None, worker_token=None, send=None):
+    opts = {"concurrency": max_in_flight, "duration": hold, "target_rps": rate, "mode": "open"}
+    if workers:
+        result = run_load_distributed(request_spec(ctx), workers, worker_token, cancel=ctx.cancel, **opts)
+    elif processes > 1:
+        result = run_load_processes(ctx.spec, processes, cancel=ctx.cancel, **opts)
+    else:
+        result = run_load(send or ctx.send, cancel=ctx.cancel, **opts)
+    hist = result["histogram"]
+    failed = sum(result["errors"].values()) + sum(n for code, n in result["statuses"].items() if code >= 500)
+    total = hist.count + sum(result["errors"].values())
+    return {
+        "offered": rate,
+        "issued": result["issued"],
+        "completed": total,
+        # measured inside the hold window; elapsed also covers draining the requests still in flight
+        "achieved": result["throughput"],
+        "p99_ms": hist.percentile(99) / 1e6 if hist.count else None,
+        "error_rate": failed / total if total else 1.0,
+        "health": result["health"],
+        "cancelled": result["cancelled"],
+    }
+
+
+def capacity_breaches(step, p99_ms, max_error_rate):
+    reasons = []
+    if step["p99_ms"] is None:
+        reasons.append("no successful calls")
+    elif p99_ms and step["p99_ms"] > p99_ms:
+        reasons.append(f"p99 {step['p99_ms']:.1f}ms > {p99_ms:g}ms")
+    if step["error_rate"] > max_error_rate:
+        reasons.append(f"errors {step['error_rate']:.1%} > {max_error_rate:.1%}")
+    if step["achieved"] < CAPACITY_KEEP_UP * step["offered"]:
+        reasons.append(f"fell behind at {step['achieved']:.1f} req/s")
+    elif step["completed"] < step["issued"]:
+        reasons.append(f"{step['issued'] - step['completed']} of {step['issued']} requests never completed")
+    return reasons
+
+
+def format_capacity(steps, p99_ms, max_error_rate, hold, max_in_flight, generators="", verdict=None):
+    lines = [f"Capacity search (SLO: p99 <= {p99_ms:g}ms, errors <= {max_error_rate:.1%}; "
+             f"{hold:g}s per step, up to {max_in_flight} in flight{generators})",
+             f"  {'offered':>9} {'achieved':>9} {'p99':>10} {'errors':>7}  result"]
+    for step in steps:
+        p99 = f"{step['p99_ms']:.1f}ms" if step["p99_ms"] is not None else "-"
+        lines.append(f"  {step['offered']:>9.1f} {step['achieved']:>9.1f} {p99:>10} {step['error_rate']:>7.1%}  "
+                     f"{step['verdict']}")
+    if verdict:
+        lines.append(verdict)
+    return "\n".join(lines)
+
+
+def iter_capacity(ctx, start_rps=10, step_rps=None, max_rps=None, hold=CAPACITY_HOLD, p99_ms=500,
+                  max_error_rate=0.01, max_in_flight=CAPACITY_IN_FLIGHT, refine=CAPACITY_REFINE,
+                  processes=1, workers=None, worker_token=None):
+    # yields the report after every step; the last one carries the verdict
+    step_rps = step_rps or start_rps
+    workers = parse_workers(workers)
+    processes = max(1, int(processes or 1))
+    ctx.baseline()
+    steps, good, bad = [], None, None
+    stopped = None
+    generators = (f" on {len(workers)} remote node(s)" if workers
+                  else f" across {processes} processes" if processes > 1 else "")
+    report = partial(format_capacity, steps, p99_ms, max_error_rate, hold, max_in_flight, generators)
+
+    def measure(rate):
+        nonlocal stopped
+        step = capacity_step(ctx, rate, hold, max_in_flight, processes, workers, worker_token, send)
+        reasons = capacity_breaches(step, p99_ms, max_error_rate)
+        if step["cancelled"]:
+            stopped, step["verdict"] = "stopped", "stopped"
+        elif step["health"] and step["health"]["suspect"]:
+            # past this point the numbers describe the tester, not the target
+            stopped, step["verdict"] = "generator", "generator saturated: " + "; ".join(step["health"]["suspect"])
+        else:
+            step["verdict"] = "breach: " + "; ".join(reasons) if reasons else "ok"
+        steps.append(step)
+        return not reasons
+
+    # one pool for every local step, so connections stay warm from step to step
+    local = processes == 1 and not workers
+    with load_sender(ctx.send, max_in_flight if local else 1) as send:
+        rate = float(start_rps)
+        while not max_rps or rate <= max_rps:
+            ok = measure(rate)
+            yield report()
+            if stopped:
+                break
+            if not ok:
+                bad = rate
+                break
+            good = rate
+            rate += step_rps
+        if bad is not None:
+            low = good or 0.0
+            for _ in range(refine):
+                mid = (low + bad) / 2
+                if bad - mid < max(1.0, 0.02 * bad):
+                    break
+                ok = measure(mid)
+                yield report()
+                if stopped:
+                    break
+                if ok:
+                    low = good = mid
+                else:
+                    bad = mid
+
+    if not steps:
+        verdict = "Capacity: nothing to run, the start rate is above the max rate"
+    elif stopped == "stopped":
+        verdict = "Capacity: stopped early" + (f", within SLO up to {good:.1f} req/s so far" if good else "")
+    elif stopped == "generator":
+        verdict = (f"Capacity: inconclusive, the load generator saturated first; the target handled "
+                   f"{good or 0:.1f} req/s within SLO. Use more processes or remote workers")
+    elif bad is None:
+        verdict = f"Capacity: no breach up to {good:.1f} req/s (raise the max rate to go further)"
+    elif good is None:
+        verdict = f"Capacity: breaches the SLO already at {bad:.1f} req/s; start lower"
+    else:
+        verdict = f"Capacity: ~{good:.1f} req/s sustainable, knee between {good:.1f} and {bad:.1f} req/s"
+    passed = [s for s in steps if s["offered"] == good and s["verdict"] == "ok"]
+    record_history("capacity", ctx.method, ctx.url, url=ctx.resolved_url, rps=good, ok=bool(good) and not stopped,
+                   p99_ms=passed[-1]["p99_ms"] if passed else None, summary=verdict)
+    yield report(verdict)
+
+
+def run_capacity_search(method, url, params, headers, body_type=None, json_body=None, form_params=None,
+                        file_key=None, uploaded_file=None, start_rps=10, step_rps=None, max_rps=None,
+                        hold=CAPACITY_HOLD, p99_ms=500, max_error_pct=1.0, max_in_flight=CAPACITY_IN_FLIGHT,
+                        processes=1, workers=None, worker_token=None, cancel=None):
+    # Gradio numbers arrive as floats and use 0 for "not set"
+    try:
+        ctx = RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file,
+                         cancel=cancel)
+        yield from iter_capacity(ctx, float(start_rps or 10), float(step_rps or 0) or None,
+                                 float(max_rps or 0) or None, float(hold or CAPACITY_HOLD), float(p99_ms or 0),
+                                 float(max_error_pct or 0) / 100, int(max_in_flight or CAPACITY_IN_FLIGHT),
+                                 processes=processes, workers=workers, worker_token=worker_token or None)
+    except Cancelled:
+        yield "Capacity: stopped"
+    except Exception as e:
+        yield f"Capacity Error: {safe_convert(e)}"
+
+
+# --- Runners ---
+def run_checks(checks, max_workers=MAX_PARALLEL_CHECKS):
+    # checks run concurrently, results come back in the order they were given
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(checks)))) as pool:
+        futures = [(name, pool.submit(check)) for name, check in checks]
+        results = []
+        for name, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(f"{name}: Error {safe_convert(e)}")
+    return results
+
+def progress_to(updates, name):
+    # progress callback for one check; the runner shows the latest text until the check finishes
+    return lambda snap: updates.put_nowait((name, format_progress(snap)))
+
+
+def render_checks(checks, results, live):
+    return "\n".join(result if result is not None else live.get(name, f"{name}: running...")
+                     for (name, _), result in zip(checks, results))
+
+
+def iter_checks(checks, max_workers=MAX_PARALLEL_CHECKS, updates=None, cancel=None):
+    # yields the report so far whenever a check finishes or posts progress; the last yield is complete
+    updates = updates or queue.Queue()
+    results = [None] * len(checks)
+    live = {}
+
+    def finished(index, name, future):
+        try:
+            updates.put_nowait((index, future.result()))
+        except Cancelled:
+            updates.put_nowait((index, f"{name}: stopped"))
+        except Exception as e:
+            updates.put_nowait((index, f"{name}: Error {safe_convert(e)}"))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(checks)))) as pool:
+        for index, (name, check) in enumerate(checks):
+            pool.submit(check).add_done_callback(partial(finished, index, name))
+        pending = len(checks)
+        try:
+            while pending:
+                key, text = updates.get()
+                if isinstance(key, int):
+                    results[key] = text
+                    pending -= 1
+                else:
+                    live[key] = text
+                yield render_checks(checks, results, live)
+        finally:
+            # the consumer stopped early (client gone); wind the checks down before the pool joins them
+            if pending and cancel is not None:
+                cancel.cancel()
+
+def run_all_tests(method, url, params, headers,
+                  body_type=None, json_body=None, form_params=None,
+                  file_key=None, uploaded_file=None, iterations=5,
+                  concurrency=1, target_rps=None, ramp_up=0, duration=None, mode="closed",
+                  processes=1, workers=None, calibrate=False, worker_token=None, cancel=None):
+    args = (method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+    ctx = RunContext(*args, cancel=cancel)
+    load = load_options(iterations, concurrency, target_rps, ramp_up, duration, mode, processes, workers,
+                        calibrate, worker_token)
+    updates = queue.Queue()
+    yield from iter_checks([
+        ("Functional", partial(test_functional, *args, ctx=ctx)),
+        ("Error Handling", partial(test_error_handling, *args, ctx=ctx)),
+        ("Performance", partial(test_performance, *args, **load, progress=progress_to(updates, "Performance"), ctx=ctx)),
+        ("Security", partial(test_security, *args, ctx=ctx)),
+    ], updates=updates, cancel=ctx.cancel)
+
+def run_selected_tests(method, url, params, headers, test_type,
+                       body_type=None, json_body=None, form_params=None,
+                       file_key=None, uploaded_file=None, iterations=5,
+                       concurrency=1, target_rps=None, ramp_up=0, duration=None, mode="closed",
+                       processes=1, workers=None, calibrate=False, worker_token=None, cancel=None):
+    if test_type == "Ручное тестирование":
+        yield "Manual testing: use your tool to send requests."
+    elif test_type == "Автоматизированное тестирование":
+        args = (method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+        ctx = RunContext(*args, cancel=cancel)
+        yield from iter_checks([
+            ("Functional", partial(test_functional, *args, ctx=ctx)),
+            ("Error Handling", partial(test_error_handling, *args, ctx=ctx)),
+        ], cancel=ctx.cancel)
+    elif test_type == "Нагрузочное тестирование":
+        load = load_options(iterations, concurrency, target_rps, ramp_up, duration, mode, processes, workers,
+                            calibrate, worker_token)
+        updates = queue.Queue()
+        ctx = RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file,
+                         cancel=cancel)
+        yield from iter_checks([("Performance", partial(
+            test_performance, method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file,
+            **load, progress=progress_to(updates, "Performance"), ctx=ctx))], updates=updates,
+            cancel=ctx.cancel)
+    elif test_type == "Тестирование безопасности":
+        ctx = RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file,
+                         cancel=cancel)
+        yield from iter_checks([("Security", partial(
+            test_security, method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file,
+            ctx=ctx))], cancel=ctx.cancel)
+    else:
+        yield "Unknown test type"
+
+# --- Async engine ---
+_async_clients = weakref.WeakKeyDictionary()
+_httpx = None
+
+
+def load_httpx():
+    # imported on first async use so sync callers never pay for it;
+    # without httpx the async path runs the pooled sync client on a thread
+    global _httpx
+    if _httpx is None:
+        try:
+            import httpx
+        except ImportError:
+            httpx = False
+        _httpx = httpx
+    return _httpx or None
+
+
+def get_async_client():
+    # httpx clients are bound to the loop they were created on
+    httpx = load_httpx()
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=POOL_SIZE)
+        transport = httpx.AsyncHTTPTransport(limits=limits, retries=MAX_RETRIES)
+        cookies = httpx.Cookies(CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])))
+        client = _async_clients[loop] = httpx.AsyncClient(
+            transport=transport, cookies=cookies, timeout=REQUEST_TIMEOUT, follow_redirects=True)
+    return client
+
+
+async def close_async_clients():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def cancel_tasks_on(cancel, tasks):
+    # a cancel from any thread cancels the tasks on their own loop; returns the unregister function
+    loop = asyncio.get_running_loop()
+
+    def cancel_all():
+        for task in list(tasks):
+            task.cancel()
+
+    return cancel.on_cancel(lambda: loop.call_soon_threadsafe(cancel_all))
+
+
+async def async_request(method, url, stream=False, cancel=None, limit=True, **kwargs):
+    if load_httpx() is None:
+        return await asyncio.to_thread(pooled_request, method, url, stream=stream, cancel=cancel, limit=limit,
+                                       **kwargs)
+    if cancel is not None:
+        # the send gets a task of its own: cancelling it makes httpx drop the connection mid-request
+        # without cancelling the caller, which may be a UI handler or a whole check
+        cancel.check()
+        send = asyncio.ensure_future(async_request(method, url, stream=stream, limit=limit, **kwargs))
+        unwatch = cancel_tasks_on(cancel, [send])
+        try:
+            return await send
+        except asyncio.CancelledError:
+            if cancel.is_set() and not asyncio.current_task().cancelling():
+                raise Cancelled("run stopped") from None
+            raise
+        finally:
+            unwatch()
+    limit = host_limit(url) if limit else None
+    if limit is not None:
+        queued = time.perf_counter_ns()
+        await limit.acquire_async()
+        queued = time.perf_counter_ns() - queued
+    try:
+        resp = await _async_send(method, url, stream, kwargs)
+    except BaseException:
+        if limit is not None:
+            limit.release()
+        raise
+    if limit is not None:
+        resp.limit_wait_ns = queued
+        if stream:
+            resp.release_host_slot = limit.release
+        else:
+            limit.release()
+    return resp
+
+
+async def _async_send(method, url, stream, kwargs):
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    headers, data, files, body = streamed_body(kwargs.pop("headers", None), kwargs.pop("data", None), kwargs.pop("files", None))
+    if body is not None:
+        kwargs["content"] = body.aiter()
+    else:
+        kwargs.update(data=data, files=files)
+    phases = {}
+    kwargs["extensions"] = {"trace": httpx_trace(phases)}
+    client = get_async_client()
+    started = time.perf_counter_ns()
+    try:
+        resp = await client.send(client.build_request(method, url, headers=headers, **kwargs), stream=True)
+        headers_timing(resp, started, phases)
+    finally:
+        if body is not None:
+            body.close()
+    if not stream:
+        try:
+            await resp.aread()
+            finish_timing(resp)
+        finally:
+            await resp.aclose()
+    return resp
+
+
+def httpx_trace(phases):
+    # httpcore resolves inside connect_tcp, so the async path reports DNS as part of connect
+    names = {"connection.connect_tcp": "connect", "connection.start_tls": "tls"}
+    marks = {}
+
+    async def trace(event, info):
+        step, _, stage = event.rpartition(".")
+        if step not in names:
+            return
+        if stage == "started":
+            marks[step] = time.perf_counter_ns()
+        elif step in marks:
+            phases[names[step]] = phases.get(names[step], 0) + time.perf_counter_ns() - marks.pop(step)
+    return trace
+
+
+async def read_body_async(resp, max_bytes=None):
+    if not hasattr(resp, "aiter_bytes"):
+        return await asyncio.to_thread(read_body, resp, max_bytes)
+    sink = BodySink(max_bytes)
+    try:
+        async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+            sink.write(chunk)
+        finish_timing(resp)
+    finally:
+        resp.body_size = sink.size
+        sink.close()
+        await resp.aclose()
+        release_host_slot(resp)
+    return sink.body()
+
+
+async def send_request_async(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file,
+                             max_body_mb=None, compact=None):
+    try:
+        resolved_url, params_dict, headers_dict, json_data, data, files = prepare_request_args(
+            method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file
+        )
+        resp = await async_request(method, resolved_url, params=params_dict, headers=headers_dict,
+                                   json=json_data, data=data, files=files, stream=True)
+        body = await read_body_async(resp, body_cap(max_body_mb))
+        record_history("send", method, url, url=resolved_url, status=resp.status_code,
+                       elapsed_ms=timings_ms(resp).get("total"))
+        return format_exchange(method, url, resp, body, params_dict, headers_dict, body_type, json_data, data, files,
+                               compact)
+    except Exception as e:
+        record_history("send", method, url, summary=safe_convert(e))
+        return json.dumps({"error": "Request Error", "details": safe_convert(e)}, indent=2)
+
+
+async def validate_status_async(method, url, params=None, headers=None, expected=200,
+                                body_type=None, json_body=None, form_params=None,
+                                file_key=None, uploaded_file=None, ctx=None):
+    ctx = ctx or RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+    status = await ctx.baseline_async()
+    return (status == expected, status)
+
+async def test_functional_async(method, url, params=None, headers=None,
+                                body_type=None, json_body=None, form_params=None,
+                                file_key=None, uploaded_file=None, ctx=None):
+    ctx = ctx or RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+    ok, status = await validate_status_async(method, url, expected=200, ctx=ctx)
+    record_history("functional", method, url, url=ctx.resolved_url, status=status, ok=ok, elapsed_ms=ctx.baseline_ms)
+    return f"Functional: {method} {url} -> {status} ({'PASS' if ok else 'FAIL'})"
+
+async def test_error_handling_async(method, url, params=None, headers=None,
+                                    body_type=None, json_body=None, form_params=None,
+                                    file_key=None, uploaded_file=None, ctx=None):
+    ctx = ctx or RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+    bad_url = ctx.resolved_url.rstrip('/') + "/nonexistent"
+    r = await async_request("GET", bad_url, params=ctx.params, headers=ctx.headers, cancel=ctx.cancel)
+    record_history("error_handling", "GET", ctx.url, url=bad_url, status=r.status_code,
+                   ok=400 <= r.status_code < 500, elapsed_ms=timings_ms(r).get("total"))
+    return f"Error Handling: GET {bad_url} -> {r.status_code}"
+
+
+async def report_async(run, progress, interval=PROGRESS_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        progress(run.snapshot())
+
+
+async def run_load_async(send, concurrency=1, iterations=None, duration=None, target_rps=None, ramp_up=0.0,
+                         mode="closed", progress=None, cancel=None):
+    run = LoadRun(concurrency, iterations, duration, target_rps, ramp_up, mode, cancel)
+    reporter = asyncio.create_task(report_async(run, progress)) if progress else None
+    with monitoring(run) as health:
+        probe = asyncio.create_task(health.probe_loop())
+        try:
+            if run.mode == "open":
+                return await _run_open_loop_async(send, run)
+            return await _run_closed_loop_async(send, run)
+        finally:
+            probe.cancel()
+            if reporter:
+                reporter.cancel()
+
+
+async def _run_closed_loop_async(send, run):
+    async def worker(index):
+        await asyncio.sleep(run.ramp_delay(index))
+        while True:
+            slot = run.take_slot()
+            if slot is None:
+                return
+            wait = slot - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            s = time.perf_counter_ns()
+            try:
+                resp = await send()
+            except Exception as e:
+                run.fail(e)
+                continue
+            run.record(time.perf_counter_ns() - s, resp)
+
+    workers = [asyncio.create_task(worker(i)) for i in range(run.concurrency)]
+    unwatch = cancel_tasks_on(run.cancel, workers)
+    try:
+        # cancelled workers just end; whatever they recorded is the partial result
+        await asyncio.gather(*workers, return_exceptions=True)
+    finally:
+        unwatch()
+    return run.result()
+
+
+async def _run_open_loop_async(send, run):
+    limit = asyncio.Semaphore(run.concurrency)
+    pending = set()
+
+    async def job(slot):
+        async with limit:
+            s = time.perf_counter_ns()
+            try:
+                resp = await send()
+            except Exception as e:
+                run.fail(e)
+                return
+            open_loop_latency(slot, s, run, resp)
+
+    unwatch = cancel_tasks_on(run.cancel, pending)
+    try:
+        while True:
+            slot = run.take_slot()
+            if slot is None:
+                break
+            wait = slot - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if run.cancel.is_set():
+                break
+            task = asyncio.create_task(job(slot))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        await asyncio.gather(*pending, return_exceptions=True)
+    finally:
+        unwatch()
+    return run.result()
+
+
+async def test_performance_async(method, url, params=None, headers=None,
+                                 body_type=None, json_body=None, form_params=None,
+                                 file_key=None, uploaded_file=None, iterations=5,
+                                 concurrency=1, target_rps=None, ramp_up=0, duration=None, mode="closed",
+                                 processes=1, workers=None, calibrate=False, worker_token=None, progress=None, ctx=None):
+    ctx = ctx or RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+    opts = load_options(iterations, concurrency, target_rps, ramp_up, duration, mode, processes, workers,
+                        calibrate, worker_token)
+    processes = opts.pop("processes")
+    workers = opts.pop("workers")
+    worker_token = opts.pop("worker_token")
+    calibrate = opts.pop("calibrate")
+    await ctx.baseline_async()
+    calibration = None
+    if calibrate and processes > 1 and not workers:
+        calibration = await asyncio.to_thread(calibrate_client, ctx, opts["concurrency"], processes)
+    elif calibrate and not workers:
+        calibration = await calibrate_client_async(ctx, opts["concurrency"])
+    if workers:
+        result = await asyncio.to_thread(run_load_distributed, request_spec(ctx), workers, worker_token,
+                                           cancel=ctx.cancel, **opts)
+    elif processes > 1:
+        result = await asyncio.to_thread(run_load_processes, ctx.spec, processes, cancel=ctx.cancel, **opts)
+    else:
+        result = await run_load_async(ctx.send_async, progress=progress, cancel=ctx.cancel, **opts)
+    result["calibration"] = calibration
+    return load_report(ctx, result)
+
+async def test_security_async(method, url, params=None, headers=None,
+                              body_type=None, json_body=None, form_params=None,
+                              file_key=None, uploaded_file=None, ctx=None):
+    ctx = ctx or RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+    status_with_auth = await ctx.baseline_async()
+
+    headers_dict_no_auth = ctx.headers.copy()
+    headers_dict_no_auth.pop("Authorization", None)
+
+    status_no_auth = (await ctx.send_async(headers=headers_dict_no_auth)).status_code
+
+    record_history("security", ctx.method, ctx.url, url=ctx.resolved_url, status=status_no_auth,
+                   ok=status_with_auth != status_no_auth)
+    if status_with_auth != status_no_auth:
+        return f"Security: Missing auth -> {status_no_auth} (Expected: {status_with_auth}) ✅"
+    else:
+        return f"Security: No auth -> {status_no_auth} ⚠️ Check endpoint access control"
+
+
+async def iter_checks_async(checks, max_workers=MAX_PARALLEL_CHECKS, updates=None, cancel=None):
+    updates = updates or asyncio.Queue()
+    limit = asyncio.Semaphore(max(1, max_workers))
+    results = [None] * len(checks)
+    live = {}
+
+    async def guarded(index, name, check):
+        async with limit:
+            try:
+                text = await check()
+            except asyncio.CancelledError:
+                updates.put_nowait((index, f"{name}: stopped"))
+                raise
+            except Cancelled:
+                text = f"{name}: stopped"
+            except Exception as e:
+                text = f"{name}: Error {safe_convert(e)}"
+        updates.put_nowait((index, text))
+
+    tasks = [asyncio.create_task(guarded(index, name, check)) for index, (name, check) in enumerate(checks)]
+    try:
+        pending = len(checks)
+        while pending:
+            key, text = await updates.get()
+            if isinstance(key, int):
+                results[key] = text
+                pending -= 1
+            else:
+                live[key] = text
+            yield render_checks(checks, results, live)
+    finally:
+        # the consumer may stop early (client gone); don't leave checks or their threads running
+        if pending and cancel is not None:
+            cancel.cancel()
+        for task in tasks:
+            task.cancel()
+
+async def run_all_tests_async(method, url, params, headers,
+                              body_type=None, json_body=None, form_params=None,
+                              file_key=None, uploaded_file=None, iterations=5,
+                              concurrency=1, target_rps=None, ramp_up=0, duration=None, mode="closed",
+                              processes=1, workers=None, calibrate=False, worker_token=None, cancel=None):
+    args = (method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+    ctx = RunContext(*args, cancel=cancel)
+    load = load_options(iterations, concurrency, target_rps, ramp_up, duration, mode, processes, workers,
+                        calibrate, worker_token)
+    updates = asyncio.Queue()
+    async for report in iter_checks_async([
+        ("Functional", partial(test_functional_async, *args, ctx=ctx)),
+        ("Error Handling", partial(test_error_handling_async, *args, ctx=ctx)),
+        ("Performance", partial(test_performance_async, *args, **load,
+                                progress=progress_to(updates, "Performance"), ctx=ctx)),
+        ("Security", partial(test_security_async, *args, ctx=ctx)),
+    ], updates=updates, cancel=ctx.cancel):
+        yield report
+
+async def run_selected_tests_async(method, url, params, headers, test_type,
+                                   body_type=None, json_body=None, form_params=None,
+                                   file_key=None, uploaded_file=None, iterations=5,
+                                   concurrency=1, target_rps=None, ramp_up=0, duration=None, mode="closed",
+                                   processes=1, workers=None, calibrate=False, worker_token=None, cancel=None):
+    if test_type == "Ручное тестирование":
+        yield "Manual testing: use your tool to send requests."
+    elif test_type == "Автоматизированное тестирование":
+        args = (method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file)
+        ctx = RunContext(*args, cancel=cancel)
+        async for report in iter_checks_async([
+            ("Functional", partial(test_functional_async, *args, ctx=ctx)),
+            ("Error Handling", partial(test_error_handling_async, *args, ctx=ctx)),
+        ], cancel=ctx.cancel):
+            yield report
+    elif test_type == "Нагрузочное тестирование":
+        load = load_options(iterations, concurrency, target_rps, ramp_up, duration, mode, processes, workers,
+                            calibrate, worker_token)
+        updates = asyncio.Queue()
+        ctx = RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file,
+                         cancel=cancel)
+        async for report in iter_checks_async([("Performance", partial(
+                test_performance_async, method, url, params, headers, body_type, json_body, form_params, file_key,
+                uploaded_file, **load, progress=progress_to(updates, "Performance"), ctx=ctx))], updates=updates,
+                cancel=ctx.cancel):
+            yield report
+    elif test_type == "Тестирование безопасности":
+        ctx = RunContext(method, url, params, headers, body_type, json_body, form_params, file_key, uploaded_file,
+                         cancel=cancel)
+        async for report in iter_checks_async([("Security", partial(
+                test_security_async, method, url, params, headers, body_type, json_body, form_params, file_key,
+                uploaded_file, ctx=ctx))], cancel=ctx.cancel):
+            yield report
+    else:
+        yield "Unknown test type"
+
+# --- Collections ---
+POSTMAN_VARIABLE = re.compile(r'\{\{\s*([\w.-]+)\s*\}\}')
+
+
+def _pairs(value):
+    if isinstance(value, dict):
+        return [[k, safe_convert(v)] for k, v in value.items()]
+    return [list(p) for p in value or []]
+
+
+def _header_rows(value):
+    if isinstance(value, dict):
+        return [[True, k, safe_convert(v)] for k, v in value.items()]
+    return [[True, *row] if len(row) == 2 else list(row) for row in value or []]
+
+
+def _postman_entries(items, variables, folder=""):
+    for item in items:
+        name = f"{folder}{item.get('name', '')}"
+        if "item" in item:
+            yield from _postman_entries(item["item"], variables, name + " / ")
+            continue
+        req = item.get("request") or {}
+        if isinstance(req, str):
+            req = {"url": req}
+        url = req.get("url") or ""
+        if isinstance(url, dict):
+            url = url.get("raw", "")
+        sub = lambda text: POSTMAN_VARIABLE.sub(lambda m: variables.get(m.group(1), m.group(0)), text or "")
+        body = req.get("body") or {}
+        entry = {
+            "name": name,
+            "method": req.get("method", "GET"),
+            "url": sub(url),
+            "headers": [[not h.get("disabled", False), h.get("key"), sub(h.get("value"))] for h in req.get("header") or []],
+        }
+        if body.get("mode") == "raw":
+            entry.update(body_type="JSON", json_body=sub(body.get("raw")))
+        elif body.get("mode") in ("urlencoded", "formdata"):
+            entry.update(body_type="Form Data", form_params=[
+                [f.get("key"), sub(f.get("value"))] for f in body[body["mode"]] or []
+                if not f.get("disabled") and f.get("type", "text") == "text"])
+        yield entry
+
+
+def load_collection(source):
+    # a list of request entries (optionally under "requests") or a Postman v2.1 collection
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, encoding='utf-8') as fh:
+            source = json.load(fh)
+    if isinstance(source, dict) and "item" in source:
+        variables = {v.get("key"): safe_convert(v.get("value", "")) for v in source.get("variable") or []}
+        source = list(_postman_entries(source["item"], variables))
+    elif isinstance(source, dict):
+        source = source.get("requests", [])
+    entries = []
+    for i, raw in enumerate(source):
+        json_body = raw.get("json_body", raw.get("body"))
+        if json_body is not None and not isinstance(json_body, str):
+            json_body = json.dumps(json_body)
+        entries.append({
+            "name": raw.get("name") or f"#{i + 1}",
+            "method": (raw.get("method") or "GET").upper(),
+            "url": raw["url"],
+            "params": _pairs(raw.get("params")),
+            "headers": _header_rows(raw.get("headers")),
+            "body_type": raw.get("body_type", "JSON"),
+            "json_body": json_body,
+            "form_params": _pairs(raw.get("form_params")),
+            "expected": int(raw.get("expected", 200)),
+        })
+    return entries
+
+
+def _run_entry(entry, cancel=None):
+    s = time.perf_counter_ns()
+    try:
+        ctx = RunContext(entry["method"], entry["url"], entry["params"], entry["headers"], entry["body_type"],
+                         entry["json_body"], entry["form_params"], cancel=cancel)
+        ok, status = validate_status(entry["method"], entry["url"], expected=entry["expected"], ctx=ctx)
+        result = entry, ok, status, time.perf_counter_ns() - s, None
+    except Cancelled:
+        raise
+    except Exception as e:
+        result = entry, False, None, time.perf_counter_ns() - s, safe_convert(e)
+    record_history("collection", entry["method"], entry["url"], status=result[2], ok=result[1],
+                   elapsed_ms=round(result[3] / 1e6, 3), summary=result[4])
+    return result
+
+
+def iter_collection(entries, workers=COLLECTION_WORKERS, cancel=None):
+    # yields (entry, ok, status, elapsed_ns, error) as each request finishes; a cancel drops the unstarted ones
+    with ThreadPoolExecutor(max_workers=max(1, int(workers or 1))) as pool:
+        futures = [pool.submit(_run_entry, e, cancel) for e in entries]
+        unwatch = cancel.on_cancel(lambda: [f.cancel() for f in futures]) if cancel is not None else None
+        try:
+            for future in as_completed(futures):
+                if future.cancelled() or isinstance(future.exception(), Cancelled):
+                    continue
+                yield future.result()
+        finally:
+            if unwatch:
+                unwatch()
+
+
+def run_collection(collection_file, workers=COLLECTION_WORKERS, cancel=None):
+    try:
+        entries = load_collection(getattr(collection_file, "name", collection_file))
+    except Exception as e:
+        yield f"Collection Error: {safe_convert(e)}"
+        return
+    lines = []
+    hist = LatencyHistogram()
+    passed = failed = errors = 0
+    start = time.monotonic()
+    for entry, ok, status, elapsed, error in iter_collection(entries, workers, cancel):
+        hist.record(elapsed)
+        if error:
+            errors += 1
+            lines.append(f"ERROR {entry['name']}: {entry['method']} {entry['url']} -> {error}")
+        else:
+            passed += ok
+            failed += not ok
+            lines.append(f"{'PASS' if ok else 'FAIL'} {entry['name']}: {entry['method']} {entry['url']} "
+                         f"-> {status} (expected {entry['expected']}, {elapsed / 1e6:.1f}ms)")
+        yield "\n".join(lines + [f"... {len(lines)}/{len(entries)} done"])
+    stopped = f", stopped with {len(entries) - len(lines)} not run" if len(lines) < len(entries) else ""
+    summary = (f"Collection: {len(entries)} requests, {passed} passed, {failed} failed, {errors} errors "
+               f"in {time.monotonic() - start:.2f}s{stopped}\n  {hist.summary()}")
+    yield "\n".join(lines + [summary])
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+import engine
+
+
+@pytest.fixture
+def star_limit():
+    engine.configure_host_limits("* 20")
+    yield engine.host_limit("http://127.0.0.1/")
+    engine.clear_host_limits()
+
+
+def test_calibration_ignores_host_limits(star_limit):
+    with engine.StandInServer() as server:
+        ctx = engine.RunContext("GET", server.url + "/items", [], [])
+        tokens = star_limit.tokens
+        cal = engine.calibrate_client(ctx, concurrency=2, seconds=0.4)
+    # a 20 req/s cap would hold the ceiling at ~20
+    assert cal["ceiling_rps"] > 100
+    # and no tokens were spent on the probes
+    assert star_limit.tokens == tokens
+
+
+def test_async_calibration_ignores_host_limits(star_limit):
+    async def run(url):
+        try:
+            return await engine.calibrate_client_async(engine.RunContext("GET", url, [], []), 2, seconds=0.4)
+        finally:
+            await engine.close_async_clients()
+
+    with engine.StandInServer() as server:
+        cal = asyncio.run(run(server.url + "/items"))
+    assert cal["ceiling_rps"] > 100
@@ -0,0 +1,62 @@
+import asyncio
+import socket
+
+import pytest
+
+import engine
+
+
+@pytest.fixture
+def closed_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_failed_requests_leave_no_cancel_hooks(closed_port):
+    token = engine.CancelToken()
+    # each attempt goes through urllib3's connect retries, so every retry's hook is covered too
+    for _ in range(5):
+        with pytest.raises(Exception):
+            engine.pooled_request("GET", f"http://127.0.0.1:{closed_port}/x", cancel=token)
+    assert token._callbacks == {}
+
+
+def test_finished_requests_leave_no_cancel_hooks():
+    token = engine.CancelToken()
+    with engine.StandInServer() as server:
+        for _ in range(20):
+            assert engine.pooled_request("GET", server.url, cancel=token).status_code == 200
+    assert token._callbacks == {}
+
+
+@pytest.mark.parametrize("test_type", ["Тестирование безопасности", "Автоматизированное тестирование"])
+def test_stop_ends_async_checks_with_a_report(test_type):
+    # the caller's task is the UI handler: a stop must end the checks, not cancel the caller
+    async def run(url):
+        token = engine.CancelToken()
+        asyncio.get_running_loop().call_later(0.3, token.cancel)
+        reports = [r async for r in engine.run_selected_tests_async("GET", url, [], [], test_type, cancel=token)]
+        await engine.close_async_clients()
+        return reports[-1]
+
+    with engine.StandInServer(latency=5.0) as server:
+        report = asyncio.run(asyncio.wait_for(run(server.url + "/slow"), 4))
+    assert report.splitlines() and all(line.endswith(": stopped") for line in report.splitlines())
+
+
+def test_stop_raises_cancelled_from_async_request():
+    async def run(url):
+        token = engine.CancelToken()
+        asyncio.get_running_loop().call_later(0.2, token.cancel)
+        try:
+            await engine.async_request("GET", url, cancel=token)
+        finally:
+            await engine.close_async_clients()
+        return token
+
+    with engine.StandInServer(latency=5.0) as server:
+        with pytest.raises(engine.Cancelled):
+            asyncio.run(run(server.url))
@@ -0,0 +1,40 @@
+import pytest
+
+import engine
+
+
+@pytest.fixture
+def slow_server():
+    # the delay is a large share of the hold, so draining in-flight requests would skew a wall-time rate
+    with engine.StandInServer(latency=0.4) as server:
+        yield server
+
+
+def test_capacity_step_measures_throughput_inside_hold(slow_server):
+    ctx = engine.RunContext("GET", slow_server.url + "/items")
+    step = engine.capacity_step(ctx, rate=10, hold=2.0, max_in_flight=20)
+    assert step["completed"] == step["issued"] == 20
+    assert step["achieved"] == pytest.approx(10, rel=0.1)
+    assert step["p99_ms"] >= 400
+    assert engine.capacity_breaches(step, p99_ms=2000, max_error_rate=0.01) == []
+
+
+def test_capacity_step_across_processes(slow_server):
+    # each share is measured inside its own window; the merged rate is their sum
+    ctx = engine.RunContext("GET", slow_server.url + "/items")
+    step = engine.capacity_step(ctx, rate=10, hold=2.0, max_in_flight=20, processes=2)
+    assert step["completed"] == step["issued"] == 20
+    assert step["achieved"] == pytest.approx(10, rel=0.1)
+    assert step["health"] is not None
+
+
+def test_capacity_breaches():
+    step = {"offered": 100.0, "achieved": 80.0, "issued": 200, "completed": 200, "p99_ms": 300.0, "error_rate": 0.05}
+    reasons = engine.capacity_breaches(step, p99_ms=200, max_error_rate=0.01)
+    assert len(reasons) == 3
+    assert reasons[0].startswith("p99") and reasons[1].startswith("errors") and reasons[2].startswith("fell behind")
+
+    kept_up = dict(step, achieved=99.0, p99_ms=100.0, error_rate=0.0)
+    assert engine.capacity_breaches(kept_up, p99_ms=200, max_error_rate=0.01) == []
+    assert engine.capacity_breaches(dict(kept_up, completed=190), p99_ms=200, max_error_rate=0.01) == [
+        "10 of 200 requests never completed"]
@@ -0,0 +1,29 @@
+import engine
+
+
+def health(samples, loop_samples=0, **values):
+    h = dict.fromkeys(engine.HEALTH_KEYS)
+    h.update(values, samples=samples, loop_samples=loop_samples)
+    h["suspect"] = engine.health_warnings(h)
+    return h
+
+
+def test_too_few_samples_are_not_flagged():
+    # a sub-second run: its p90 is its worst wakeup
+    short = health(3, 3, cpu_mean=1.0, cpu_max=1.0, delay_p90_ms=50.0, loop_lag_p90_ms=50.0)
+    assert short["suspect"] == []
+    assert engine.merge_health([short, short, short])["suspect"] == []
+
+
+def test_enough_samples_are_flagged():
+    busy = health(engine.HEALTH_MIN_SAMPLES, cpu_mean=0.95, cpu_max=1.0, delay_p90_ms=20.0)
+    assert len(busy["suspect"]) == 2
+    merged = engine.merge_health([health(3, delay_p90_ms=90.0), busy])
+    assert merged["delay_p90_ms"] == 90.0
+    assert merged["suspect"] == ["CPU at 95% of a core", "threads woke 20.0ms late (p90)"]
+
+
+def test_no_data_has_no_generator_line():
+    assert engine.format_health(health(0)) == []
+    lines = engine.format_health(health(1, cpu_mean=0.1, cpu_max=0.1, delay_p90_ms=0.1, delay_p99_ms=0.2))
+    assert lines == ["  generator: cpu mean 10% max 10% of a core, scheduling delay p90 0.10ms p99 0.20ms"]
@@ -0,0 +1,59 @@
+import math
+import random
+
+import pytest
+
+import engine
+
+H = engine.LatencyHistogram
+
+
+def samples(n, seed=1):
+    rng = random.Random(seed)
+    # latencies from ~10us to ~10s, the range the load engine sees
+    return [int(rng.lognormvariate(math.log(2e6), 2.0)) for _ in range(n)]
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 255, 256, 257, 1000, 65_535, 10**6, 10**9 + 7, 2**40 + 3])
+def test_index_upper_round_trip(value):
+    idx = H._index(value)
+    upper = H._upper(idx)
+    assert upper >= value
+    assert H._index(upper) == idx
+    assert H._index(upper + 1) == idx + 1
+    assert upper - value <= value / 2 ** (H.SUB_BITS - 1)
+
+
+def test_buckets_are_contiguous():
+    # each bucket starts right after the previous one ends, so no value falls between them
+    for idx in range(1, 3000):
+        assert H._index(H._upper(idx - 1) + 1) == idx
+
+
+@pytest.mark.parametrize("q", [50, 90, 99, 99.9])
+def test_percentile_within_one_percent(q):
+    values = samples(20_000)
+    hist = H()
+    for v in values:
+        hist.record(v)
+    exact = sorted(values)[max(1, math.ceil(q / 100 * len(values))) - 1]
+    assert hist.percentile(q) >= exact
+    assert hist.percentile(q) <= exact * 1.01
+    assert hist.percentile(100) == max(values)
+
+
+def test_merge_matches_recording_everything():
+    a_values, b_values = samples(5000, seed=2), samples(3000, seed=3)
+    a, b, both = H(), H(), H()
+    for v in a_values:
+        a.record(v)
+        both.record(v)
+    for v in b_values:
+        b.record(v)
+        both.record(v)
+    merged = H.from_dict(a.to_dict()).merge(H.from_dict(b.to_dict()))
+    assert merged.counts == both.counts
+    assert (merged.count, merged.total, merged.min, merged.max) == (both.count, both.total, both.min, both.max)
+    assert merged.percentile(99) == both.percentile(99)
+    assert merged.stddev() == pytest.approx(both.stddev())
+    assert H().merge(H()).count == 0 and H().merge(a).min == a.min
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import engine
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_rate_spaces_requests_evenly():
+    limit = engine.HostLimit(rps=50)
+    stamps = []
+    for _ in range(6):
+        limit.acquire()
+        stamps.append(time.monotonic())
+    # the first token is free; then one every 20ms, never a burst (a late wakeup only
+    # shortens the next gap, the schedule itself doesn't drift)
+    for i, stamp in enumerate(stamps):
+        assert stamp - stamps[0] >= 0.02 * i - 0.002
+    assert stamps[-1] - stamps[0] == pytest.approx(0.1, abs=0.03)
+
+
+def queue_up(limit, count, order, cancel=None):
+    # starts waiters one at a time so their queue order is known
+    threads, errors = [], []
+
+    def wait(i):
+        try:
+            limit.acquire(cancel)
+            order.append(i)
+        except engine.Cancelled as e:
+            errors.append(e)
+
+    for i in range(count):
+        t = threading.Thread(target=wait, args=(i,), daemon=True)
+        t.start()
+        wait_for(lambda: len(limit.waiters) == i + 1)
+        threads.append(t)
+    return threads, errors
+
+
+def test_slots_pass_to_waiters_in_order():
+    limit = engine.HostLimit(max_in_flight=1)
+    limit.acquire()
+    order = []
+    threads, _ = queue_up(limit, 3, order)
+    for i in range(3):
+        limit.release()
+        wait_for(lambda: len(order) == i + 1)
+        # the slot went straight to the next waiter: still exactly one in flight
+        assert limit.in_flight == 1
+    limit.release()
+    for t in threads:
+        t.join(1)
+    assert order == [0, 1, 2]
+    assert limit.in_flight == 0 and not limit.waiters
+
+
+def test_cancel_while_queued_gives_nothing_back_twice():
+    limit = engine.HostLimit(max_in_flight=1)
+    limit.acquire()
+    token = engine.CancelToken()
+    order = []
+    threads, errors = queue_up(limit, 2, order, cancel=token)
+    token.cancel()
+    for t in threads:
+        t.join(1)
+    assert len(errors) == 2 and order == []
+    assert not limit.waiters and limit.in_flight == 1
+    limit.release()
+    assert limit.in_flight == 0
+    assert token._callbacks == {}
+
+
+def test_async_cancel_while_queued():
+    limit = engine.HostLimit(max_in_flight=1)
+
+    async def go():
+        await limit.acquire_async()
+        waiter = asyncio.create_task(limit.acquire_async())
+        await asyncio.sleep(0.01)
+        assert len(limit.waiters) == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limit.release()
+
+    asyncio.run(go())
+    assert limit.in_flight == 0 and not limit.waiters
+
+
+@pytest.mark.parametrize("mode, latency_ms", [("closed", 20), ("open", 120)])
+def test_limiter_wait_leaves_latency_only_in_closed_loop(mode, latency_ms):
+    run = engine.LoadRun(mode=mode, target_rps=10 if mode == "open" else None)
+    resp = type("Resp", (), {"status_code": 200, "limit_wait_ns": 100_000_000})()
+    run.record(120_000_000, resp, service_ns=120_000_000)
+    assert run.histogram.max == latency_ms * 1_000_000
+    assert run.service.max == 20_000_000
+    assert run.limit_wait.count == 1
@@ -0,0 +1,21 @@
+import pytest
+
+import engine
+
+BIG = 12345678901234567890123
+
+
+@pytest.mark.parametrize("backend", engine.JSON_BACKENDS)
+def test_big_integers_stay_exact(backend):
+    previous = engine.json_backend
+    try:
+        engine.use_json_backend(backend)
+    except ImportError:
+        pytest.skip(f"{backend} is not installed")
+    try:
+        assert engine.json_loads(bytearray(b'{"id": %d}' % BIG)) == {"id": BIG}
+        assert engine.json_loads('{"id": 1.5, "n": 42}') == {"id": 1.5, "n": 42}
+        assert engine.json_dumps({"id": BIG}, pretty=False) == '{"id":%d}' % BIG
+        assert engine.json_loads(engine.json_dumps({"id": BIG})) == {"id": BIG}
+    finally:
+        engine.use_json_backend(previous)
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+from urllib3 import encode_multipart_formdata
+
+import engine
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / "data.bin"
+    # larger than one chunk, and not a multiple of it
+    path.write_bytes(bytes(range(256)) * (engine.CHUNK_SIZE // 128 + 3))
+    return engine.FileSource(str(path), "report \"q1\".bin", "application/octet-stream")
+
+
+def expected(stream, fields, upload):
+    with upload.open() as f:
+        content = f.read()
+    return encode_multipart_formdata(
+        list(fields.items()) + [("file", (upload.filename.replace('"', "%22"), content, upload.content_type))],
+        boundary=stream.boundary)[0]
+
+
+def test_body_is_byte_exact_and_len_matches(upload):
+    fields = {"name": "widget", "note": "ünïcode"}
+    stream = engine.MultipartStream(fields, {"file": upload})
+    body = b"".join(stream)
+    assert body == expected(stream, fields, upload)
+    assert len(stream) == len(body)
+    assert stream.content_type == f"multipart/form-data; boundary={stream.boundary}"
+
+
+def test_small_reads_and_async_iteration_give_the_same_bytes(upload):
+    fields = {"k": "v"}
+    stream = engine.MultipartStream(fields, {"file": upload})
+    chunks = []
+    while chunk := stream.read(1000):
+        chunks.append(chunk)
+    assert b"".join(chunks) == expected(stream, fields, upload)
+    assert stream.read() == b""
+
+    async def collect(s):
+        return b"".join([chunk async for chunk in s.aiter()])
+    stream = engine.MultipartStream(fields, {"file": upload})
+    assert asyncio.run(collect(stream)) == expected(stream, fields, upload)
+
+
+def test_streamed_body_sets_length_and_drops_stale_headers(upload):
+    headers, data, files, stream = engine.streamed_body(
+        {"Content-Type": "application/json", "content-length": "1", "X-Trace": "1"}, {"k": "v"}, {"file": upload})
+    assert data is stream and files is None
+    assert headers == {"X-Trace": "1", "Content-Type": stream.content_type, "Content-Length": str(len(stream))}
+    assert engine.streamed_body({}, {"k": "v"}, None) == ({}, {"k": "v"}, None, None)
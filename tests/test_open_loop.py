@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+import engine
+
+RATE, DURATION, IN_FLIGHT, SERVICE = 40, 1.0, 2, 0.1
+
+
+@pytest.fixture
+def slow_server():
+    # two in flight at 100ms each serve 20 req/s, half the offered rate
+    with engine.StandInServer(latency=SERVICE) as server:
+        yield server
+
+
+def check_queueing_counts(result):
+    assert result["issued"] == RATE * DURATION
+    assert result["histogram"].count == result["issued"]
+    service_p50 = result["service"].percentile(50)
+    assert service_p50 == pytest.approx(SERVICE * 1e9, rel=0.5)
+    # latency runs from the intended start, so the backlog behind the stalled server shows up
+    assert result["histogram"].percentile(50) > 3 * service_p50
+
+
+def test_open_loop_counts_queueing(slow_server):
+    ctx = engine.RunContext("GET", slow_server.url + "/items")
+    check_queueing_counts(engine.run_load(ctx.send, concurrency=IN_FLIGHT, duration=DURATION, target_rps=RATE,
+                                          mode="open"))
+
+
+def test_open_loop_counts_queueing_async(slow_server):
+    async def run():
+        ctx = engine.RunContext("GET", slow_server.url + "/items")
+        try:
+            return await engine.run_load_async(ctx.send_async, concurrency=IN_FLIGHT, duration=DURATION,
+                                               target_rps=RATE, mode="open")
+        finally:
+            await engine.close_async_clients()
+
+    check_queueing_counts(asyncio.run(run()))
+
+
+@pytest.mark.parametrize("rate, duration", [(5, 2.0), (10, 1.0), (3, 1.0)])
+def test_open_loop_issues_exactly_rate_times_duration(rate, duration):
+    # no extra slot from float drift at the deadline
+    run = engine.LoadRun(concurrency=1, duration=duration, target_rps=rate, mode="open")
+    issued = 0
+    while run.take_slot() is not None:
+        issued += 1
+    assert issued == round(rate * duration)
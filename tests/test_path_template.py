@@ -0,0 +1,35 @@
+import pytest
+
+import engine
+
+
+def test_compile_splits_literals_and_variables():
+    segments, variables = engine.compile_path_template("https://api.example.com/users/{id}/posts/:post?x=1")
+    assert segments == ("https://api.example.com/users/", ("id", "{id}"), "/posts/", ("post", ":post"), "?x=1")
+    assert variables == {"id", "post"}
+
+
+def test_compile_without_variables_and_cached():
+    url = "https://api.example.com/items"
+    assert engine.compile_path_template(url) == ((url,), frozenset())
+    assert engine.compile_path_template(url) is engine.compile_path_template(url)
+
+
+@pytest.mark.parametrize("url, values, expected", [
+    ("/users/{id}", {"id": "5"}, "/users/5"),
+    ("/users/{id}/{id}", {"id": "5"}, "/users/5/5"),
+    ("/users/:id/x", {"id": "5"}, "/users/5/x"),
+    ("/users/{id}/{sub}", {"id": "5"}, "/users/5/{sub}"),
+    ("/users", {"id": "5"}, "/users"),
+])
+def test_render_fills_known_and_keeps_unknown(url, values, expected):
+    segments, _ = engine.compile_path_template(url)
+    assert engine.render_path_template(segments, values) == expected
+
+
+def test_process_path_variables_moves_the_rest_to_query():
+    url, rest = engine.process_path_variables(
+        "https://api.example.com/items/{id}/{sub}",
+        [["id", " 42 "], ["sub", "details"], ["q", "1"], ["", "x"], ["empty", ""], [7, 8]])
+    assert url == "https://api.example.com/items/42/details"
+    assert rest == [["q", "1"], ["7", "8"]]
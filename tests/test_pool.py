@@ -0,0 +1,32 @@
+import engine
+
+
+def test_wide_load_run_leaves_the_shared_pool_alone():
+    with engine.StandInServer() as server:
+        ctx = engine.RunContext("GET", server.url + "/items")
+        shared = engine.get_session(server.url)
+        pool_size = engine.POOL_SIZE
+        concurrency = pool_size + 10
+        out = engine.test_performance("GET", server.url + "/items", iterations=concurrency * 10,
+                                      concurrency=concurrency, ctx=ctx)
+        assert out.startswith(f"Performance: {concurrency * 10} calls")
+        assert engine.POOL_SIZE == pool_size
+        assert engine.get_session(server.url) is shared
+
+
+def test_wide_load_run_keeps_its_connections(caplog):
+    with engine.StandInServer(latency=0.02) as server:
+        ctx = engine.RunContext("GET", server.url + "/items")
+        ctx.baseline()
+        concurrency = engine.POOL_SIZE + 10
+        with engine.load_sender(ctx.send, concurrency) as send:
+            result = engine.run_load(send, concurrency=concurrency, iterations=concurrency * 20)
+    assert result["histogram"].count == concurrency * 20
+    # a pool narrower than the workers drops connections it has no room for
+    assert "Connection pool is full" not in caplog.text
+
+
+def test_narrow_load_run_uses_the_shared_pool():
+    send = object()
+    with engine.load_sender(send, engine.POOL_SIZE) as run_send:
+        assert run_send is send
@@ -0,0 +1,27 @@
+import os
+import time
+
+import engine
+
+
+def test_spills_are_bounded_and_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "SPILL_DIR", str(tmp_path))
+    old = tmp_path / "fapi-body-old.bin"
+    old.write_bytes(b"x")
+    stale = time.time() - engine.SPILL_MAX_AGE - 60
+    os.utime(old, (stale, stale))
+
+    saved = []
+    for _ in range(engine.SPILL_KEEP + 5):
+        sink = engine.BodySink(max_bytes=4)
+        sink.write(b"0123456789")
+        sink.close()
+        saved.append(sink.body()["saved_to"])
+
+    left = sorted(p.name for p in tmp_path.iterdir())
+    assert "fapi-body-old.bin" not in left
+    assert len(left) <= engine.SPILL_KEEP
+    assert os.path.basename(saved[-1]) in left
+
+    engine.remove_spills()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,82 @@
+import io
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import engine
+
+
+@pytest.fixture
+def worker():
+    server = engine.WorkerServer(("127.0.0.1", 0), engine.WorkerHandler)
+    server.token = "s3cret"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def spec():
+    with engine.StandInServer() as server:
+        yield {"method": "GET", "url": server.url + "/items", "params": {}, "headers": {},
+               "json": None, "data": None, "files": {}}
+
+
+OPTS = {"iterations": 3, "concurrency": 1, "target_rps": None, "ramp_up": 0.0, "duration": None, "mode": "closed"}
+
+
+def test_run_needs_the_token(worker, spec):
+    for token in (None, "wrong"):
+        with pytest.raises(RuntimeError, match="token"):
+            engine.call_worker(worker, spec, OPTS, token=token)
+    result = engine.call_worker(worker, spec, OPTS, token="s3cret")
+    assert result["statuses"] == {200: 3}
+
+
+def test_open_bind_needs_a_token(monkeypatch):
+    monkeypatch.delenv(engine.WORKER_TOKEN_ENV, raising=False)
+    with pytest.raises(ValueError, match="token"):
+        engine.serve_worker("0.0.0.0", 0)
+    assert engine.is_loopback("127.0.0.1") and engine.is_loopback("::1") and engine.is_loopback("localhost")
+    assert not engine.is_loopback("") and not engine.is_loopback("0.0.0.0")
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / "artifact.bin"
+    path.write_bytes(os.urandom(3 * engine.CHUNK_SIZE + 7))
+    return path
+
+
+def test_uploads_stream_after_the_run_line(upload, tmp_path):
+    ctx = engine.RunContext("POST", "http://127.0.0.1/upload", [], [], "Form Data", "", [["k", "v"]], "file",
+                            SimpleNamespace(name=str(upload)))
+    spec = engine.request_spec(ctx)
+    assert spec["files"]["file"]["size"] == upload.stat().st_size
+    stream = io.BytesIO()
+    engine.send_uploads(stream, spec["files"])
+    stream.seek(0)
+    received = tmp_path / "received"
+    received.mkdir()
+    files = engine.receive_uploads(stream, spec["files"], str(received))
+    with files["file"].open() as f:
+        assert f.read() == upload.read_bytes()
+    assert files["file"].filename == "artifact.bin"
+
+
+def test_run_with_upload(worker, upload):
+    with engine.StandInServer() as server:
+        ctx = engine.RunContext("POST", server.url + "/upload", [], [], "Form Data", "", [["k", "v"]], "file",
+                                SimpleNamespace(name=str(upload)))
+        result = engine.call_worker(worker, engine.request_spec(ctx), OPTS, token="s3cret")
+    assert result["statuses"] == {200: 3}
+
+
+def test_refused_run_with_upload_reports_why(worker, upload):
+    ctx = engine.RunContext("POST", "http://127.0.0.1/upload", [], [], "Form Data", "", [], "file",
+                            SimpleNamespace(name=str(upload)))
+    with pytest.raises(RuntimeError, match="token"):
+        engine.call_worker(worker, engine.request_spec(ctx), OPTS, token="wrong")